@@ -0,0 +1,302 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from perfstats.ingest import LongFrameBuilder, extract_entries, find_result_files, load_json, load_results
+from perfstats.metrics import compile_metrics
+from perfstats.profiling import Profile
+from perfstats.significance import add_significance
+from perfstats.stats import aggregate
+
+# Ingestion benchmarks.
+#   python benchmark.py ingest [--rows 1000 10000 100000] [--concat-limit 20000]
+#     Times building the long-format (Website, Variant, Metric, Value) frame
+#     against row count, comparing the old per-row pd.concat accumulation
+#     with LongFrameBuilder.
+#   python benchmark.py load [--sites 20] [--variants 4] [--iterations 25] [--jobs 1 4 8] [--stream] [--cache]
+#     Generates a synthetic <site>/<variant>/browsertime.json tree and times
+#     load_results serially and with process pools (and with the streaming
+#     parser when --stream is given, and through the extraction cache with --cache).
+#   python benchmark.py stages [--sites 20] [--variants 4] [--iterations 25] [--metrics 18]
+#                              [--payload-kb 1024] [--output results.json] [--compare old.json]
+#     Runs the pipeline stage by stage (walk, parse, extract, build, aggregate,
+#     significance, render) on a synthetic tree, recording the time and the
+#     tracemalloc peak of each stage. --output writes the results as JSON and
+#     --compare prints the change against an earlier results file.
+
+PERFSTAT_NAMES = [
+    'AsyncOpenToConnectEnd', 'AsyncOpenToFirstSent', 'HttpSubItemDnsTime',
+    'DNSLookupCacheHit', 'DNSLookupNetworkFirst', 'DNSLookupNetworkShared',
+    'document_dns_lookup', 'trr_lookup_time', 'trr_dns_start', 'trr_dns_end',
+    'trr_tcp_connection', 'trr_tls_handshake', 'trr_open_to_first_sent',
+    'trr_first_sent_to_last_received', 'trr_open_to_first_received', 'trr_complete_load',
+]
+
+STAGES = ('walk', 'parse', 'extract', 'build', 'aggregate', 'significance', 'render')
+
+BENCHMARK_METRICS = [[name, f"geckoPerfStats.{name}"] for name in PERFSTAT_NAMES] + [
+    ["trr_dns_start_per_channel", "geckoPerfStats.trr_dns_start / geckoPerfStats.trr_service_channel_count"],
+    ["connectStart", "browserScripts.timings.navigationTiming.connectStart"],
+]
+
+
+def benchmark_metrics(num_metrics):
+    # The first num_metrics of BENCHMARK_METRICS, padded with extra
+    # geckoPerfStats entries; returns (metrics, perfstat names to generate).
+    extra = [f"perfstat_{k}" for k in range(max(0, num_metrics - len(BENCHMARK_METRICS)))]
+    metrics = BENCHMARK_METRICS[:num_metrics] + [[name, f"geckoPerfStats.{name}"] for name in extra]
+    return metrics, PERFSTAT_NAMES + extra
+
+
+def synthetic_rows(num_rows, num_metrics=12, num_variants=4, num_websites=50):
+    rng = np.random.default_rng(0)
+    values = rng.gamma(2.0, 20.0, num_rows)
+    for n in range(num_rows):
+        metric = n % num_metrics
+        variant = (n // num_metrics) % num_variants
+        website = (n // (num_metrics * num_variants)) % num_websites
+        yield f"site_{website}", f"variant_{variant}", f"metric_{metric}", values[n]
+
+
+def ingest_concat(rows):
+    warnings.simplefilter('ignore', FutureWarning)
+    df = pd.DataFrame(columns=['Website', 'Variant', 'Metric', 'Value'])
+    for website, variant, metric, value in rows:
+        df = pd.concat([df, pd.DataFrame({'Website': website, 'Variant': variant, 'Metric': metric, 'Value': value}, index=[0])], ignore_index=True)
+    return df
+
+
+def ingest_builder(rows):
+    builder = LongFrameBuilder()
+    for website, variant, metric, value in rows:
+        builder.append(website, variant, metric, value)
+    return builder.build()
+
+
+def time_ingest(ingest, num_rows):
+    rows = list(synthetic_rows(num_rows))
+    start = time.perf_counter()
+    df = ingest(rows)
+    elapsed = time.perf_counter() - start
+    assert len(df) == num_rows
+    return elapsed
+
+
+def synthetic_entry(rng, iterations, payload_kb, perfstat_names=PERFSTAT_NAMES):
+    gecko_perf_stats = []
+    browser_scripts = []
+    for _ in range(iterations):
+        stats = {name: float(value) for name, value in zip(perfstat_names, rng.gamma(2.0, 20.0, len(perfstat_names)))}
+        stats['trr_service_channel_count'] = int(rng.integers(0, 4))
+        gecko_perf_stats.append(stats)
+        navigation_timing = {key: float(value) for key, value in zip(
+            ('fetchStart', 'domainLookupStart', 'domainLookupEnd', 'connectStart', 'connectEnd', 'responseStart'),
+            np.sort(rng.uniform(0, 200, 6)))}
+        browser_scripts.append({
+            'timings': {'navigationTiming': navigation_timing, 'pageTimings': {'fullyLoaded': float(rng.uniform(500, 5000))}},
+            # browserScripts carry large unrelated payloads (resource timings, custom scripts)
+            'pageinfo': {'resources': ['x' * 100] * (payload_kb * 10 // max(iterations, 1))},
+        })
+    return {
+        'info': {'url': 'https://example.com/', 'browsertime': {'version': '21.0.0'}},
+        'browserScripts': browser_scripts,
+        'geckoPerfStats': gecko_perf_stats,
+        'visualMetrics': [{'SpeedIndex': int(rng.integers(500, 3000))} for _ in range(iterations)],
+    }
+
+
+def generate_tree(root, sites, variants, iterations, payload_kb, seed=0, perfstat_names=PERFSTAT_NAMES):
+    rng = np.random.default_rng(seed)
+    for site in range(sites):
+        for variant in range(variants):
+            variant_dir = os.path.join(root, f"site_{site}.example.com", f"variant_{variant}")
+            os.makedirs(variant_dir, exist_ok=True)
+            with open(os.path.join(variant_dir, 'browsertime.json'), 'w') as file:
+                json.dump([synthetic_entry(rng, iterations, payload_kb, perfstat_names)], file)
+
+
+def main_load(args):
+    with tempfile.TemporaryDirectory() as root:
+        generate_tree(root, args.sites, args.variants, args.iterations, args.payload_kb)
+        tree_mb = sum(os.path.getsize(os.path.join(dirpath, name))
+                      for dirpath, _, names in os.walk(root) for name in names) / 1e6
+        print(f"tree: {args.sites} sites x {args.variants} variants x {args.iterations} iterations, {tree_mb:.1f} MB")
+        print(f"{'parser':>10} {'jobs':>6} {'seconds':>10} {'MB/s':>10}")
+        reference = None
+        for stream in ((False, True) if args.stream else (False,)):
+            for jobs in args.jobs:
+                start = time.perf_counter()
+                df = load_results(root, BENCHMARK_METRICS, 'geckoPerfStats', jobs=jobs, stream=stream,
+                                  use_cache=False)
+                elapsed = time.perf_counter() - start
+                if reference is None:
+                    reference = df
+                else:
+                    pd.testing.assert_frame_equal(reference, df)
+                print(f"{'stream' if stream else 'full':>10} {jobs:>6} {elapsed:10.3f} {tree_mb / elapsed:10.1f}")
+        if args.cache:
+            for label, rebuild in (('cold', True), ('warm', False)):
+                start = time.perf_counter()
+                df = load_results(root, BENCHMARK_METRICS, 'geckoPerfStats', rebuild_cache=rebuild)
+                elapsed = time.perf_counter() - start
+                pd.testing.assert_frame_equal(reference, df)
+                print(f"{'cache ' + label:>10} {1:>6} {elapsed:10.3f} {tree_mb / elapsed:10.1f}")
+
+
+def run_stages(root, metrics, timer, render_dir=None):
+    with timer.stage('walk'):
+        result_files = list(find_result_files(root))
+    compiled_metrics = compile_metrics(metrics)
+    metric_names = [name for name, _ in metrics]
+    builder = LongFrameBuilder()
+    for website, variant, run, file_path in result_files:
+        with timer.stage('parse'):
+            data = load_json(file_path)
+        with timer.stage('extract'):
+            values = extract_entries(data, compiled_metrics, 'geckoPerfStats')
+        del data
+        with timer.stage('build'):
+            builder.extend_block(website, variant, metric_names, values, run=run,
+                                 source=os.path.relpath(file_path, root))
+    with timer.stage('build'):
+        df = builder.build()
+    with timer.stage('aggregate'):
+        stats = aggregate(df)
+    with timer.stage('significance'):
+        stats = add_significance(df, stats)
+    if render_dir is not None:
+        from perfstats.render import render_figures
+
+        with timer.stage('render'):
+            render_figures(df, stats, metric_names, 'violin', output_dir=render_dir, headless=True)
+    return df
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main_stages(args):
+    metrics, perfstat_names = benchmark_metrics(args.metrics)
+    with tempfile.TemporaryDirectory() as root:
+        generate_tree(root, args.sites, args.variants, args.iterations, args.payload_kb,
+                      perfstat_names=perfstat_names)
+        tree_mb = sum(os.path.getsize(os.path.join(dirpath, name))
+                      for dirpath, _, names in os.walk(root) for name in names) / 1e6
+        render_dir = None if args.no_render else os.path.join(root, '.plots')
+        print(f"tree: {args.sites} sites x {args.variants} variants x {args.iterations} iterations x "
+              f"{len(metrics)} metrics, {tree_mb:.1f} MB")
+
+        # timings are the best of --repeat runs; memory is measured in a
+        # separate run since tracemalloc slows allocation-heavy stages down
+        best = None
+        for _ in range(args.repeat):
+            timer = Profile()
+            df = run_stages(root, metrics, timer, render_dir)
+            seconds = {stage: timer.seconds.get(stage, 0.0) for stage in STAGES}
+            best = seconds if best is None else {stage: min(best[stage], seconds[stage]) for stage in STAGES}
+        memory = Profile()
+        tracemalloc.start()
+        try:
+            run_stages(root, metrics, memory, render_dir)
+        finally:
+            tracemalloc.stop()
+
+    stages = {stage: {'seconds': best[stage], 'peak_mb': memory.peak_bytes.get(stage, 0) / 1e6}
+              for stage in STAGES if not (stage == 'render' and args.no_render)}
+    results = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'revision': _git_revision(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'config': {'sites': args.sites, 'variants': args.variants, 'iterations': args.iterations,
+                   'metrics': len(metrics), 'payload_kb': args.payload_kb, 'repeat': args.repeat},
+        'tree_mb': tree_mb,
+        'rows': len(df),
+        'total_seconds': sum(stage['seconds'] for stage in stages.values()),
+        'stages': stages,
+    }
+
+    previous = None
+    if args.compare:
+        with open(args.compare, 'r') as file:
+            previous = json.load(file)['stages']
+    print(f"{'stage':>14} {'seconds':>10} {'peak MB':>10}" + (f" {'vs prev':>10}" if previous else ''))
+    for stage, result in stages.items():
+        line = f"{stage:>14} {result['seconds']:10.3f} {result['peak_mb']:10.1f}"
+        if previous:
+            before = previous.get(stage, {}).get('seconds')
+            line += f" {result['seconds'] / before:9.2f}x" if before else f" {'-':>10}"
+        print(line)
+    print(f"{'total':>14} {results['total_seconds']:10.3f}")
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+        print(f"Wrote {args.output}")
+
+
+def main_ingest(args):
+    row_counts, concat_limit = args.rows, args.concat_limit
+    print(f"{'rows':>10} {'concat (s)':>12} {'builder (s)':>12} {'rows/s (builder)':>18}")
+    for num_rows in row_counts:
+        builder_time = time_ingest(ingest_builder, num_rows)
+        if num_rows <= concat_limit:
+            concat_time = f"{time_ingest(ingest_concat, num_rows):12.3f}"
+        else:
+            concat_time = f"{'skipped':>12}"
+        print(f"{num_rows:>10} {concat_time} {builder_time:12.3f} {num_rows / builder_time:18.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark perfstats ingestion")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    ingest_parser = subparsers.add_parser('ingest', help="time long-format frame building against row count")
+    ingest_parser.add_argument('--rows', type=int, nargs='+', default=[1000, 5000, 20000, 100000, 1000000])
+    ingest_parser.add_argument('--concat-limit', type=int, default=20000,
+                               help="skip the pd.concat baseline above this many rows (it is quadratic)")
+    ingest_parser.set_defaults(func=main_ingest)
+
+    load_parser = subparsers.add_parser('load', help="time loading a synthetic browsertime tree")
+    load_parser.add_argument('--sites', type=int, default=20)
+    load_parser.add_argument('--variants', type=int, default=4)
+    load_parser.add_argument('--iterations', type=int, default=25)
+    load_parser.add_argument('--payload-kb', type=int, default=1024,
+                             help="approximate size of unrelated browserScripts payload per file")
+    load_parser.add_argument('--jobs', type=int, nargs='+', default=[1, os.cpu_count() or 1])
+    load_parser.add_argument('--stream', action='store_true',
+                             help="also time the streaming (ijson) parser")
+    load_parser.add_argument('--cache', action='store_true',
+                             help="also time a cold and a warm run through the extraction cache")
+    load_parser.set_defaults(func=main_load)
+
+    stages_parser = subparsers.add_parser('stages', help="time and memory-profile each pipeline stage")
+    stages_parser.add_argument('--sites', type=int, default=20)
+    stages_parser.add_argument('--variants', type=int, default=4)
+    stages_parser.add_argument('--iterations', type=int, default=25)
+    stages_parser.add_argument('--metrics', type=int, default=len(BENCHMARK_METRICS),
+                               help="number of metrics to extract (extra synthetic perfstats are added past the built-in ones)")
+    stages_parser.add_argument('--payload-kb', type=int, default=1024,
+                               help="approximate size of unrelated browserScripts payload per file")
+    stages_parser.add_argument('--repeat', type=int, default=1, help="report the best of N timed runs")
+    stages_parser.add_argument('--no-render', action='store_true', help="skip the render stage")
+    stages_parser.add_argument('--output', help="write the results to this JSON file")
+    stages_parser.add_argument('--compare', help="print the change against an earlier --output file")
+    stages_parser.set_defaults(func=main_stages)
+
+    args = parser.parse_args()
+    args.func(args)
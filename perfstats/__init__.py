@@ -0,0 +1,23 @@
+# Extract, summarize and plot perfstats from comparative browsertime runs.
+# Importing the package does not import matplotlib; only perfstats.render does.
+
+from .export import EXPORT_FORMATS, export_tables
+from .filtering import filter_iterations
+from .history import HistoryStore, change_point, regressions
+from .ingest import LongFrameBuilder, load_results
+from .metrics import compile_metric, compile_metrics, referenced_paths
+from .pipeline import extract, summarize
+from .presets import PRESETS, load_metric_set
+from .report import report_data, write_report
+from .stats import OVERALL, aggregate, print_stats
+
+__all__ = [
+    'EXPORT_FORMATS', 'export_tables',
+    'HistoryStore', 'change_point', 'regressions',
+    'LongFrameBuilder', 'load_results',
+    'compile_metric', 'compile_metrics', 'referenced_paths',
+    'extract', 'filter_iterations', 'summarize',
+    'PRESETS', 'load_metric_set',
+    'report_data', 'write_report',
+    'OVERALL', 'aggregate', 'print_stats',
+]
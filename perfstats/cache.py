@@ -0,0 +1,114 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+# Persistent extraction cache.
+# One SQLite file at the root of the results tree stores the extracted
+# (iterations x metrics) block of every browsertime.json, keyed on the file's
+# path relative to the root, its size and mtime, and a hash of the metric
+# definitions. Re-runs only parse files that are new or have changed, or all
+# of them when the metric set changes.
+#
+# Writes are committed in small batches (COMMIT_FILES files or
+# COMMIT_SECONDS), so a concurrent run on the same tree is not locked out
+# for the whole parse. Any SQLite error disables the cache for the rest of
+# the run instead of aborting the extraction.
+
+logger = logging.getLogger(__name__)
+
+CACHE_FILENAME = '.perfstats_cache.sqlite'
+CACHE_VERSION = 1
+COMMIT_FILES = 64
+COMMIT_SECONDS = 0.5
+
+
+def metrics_hash(metrics_to_parse, iterate_over):
+    key = json.dumps({'version': CACHE_VERSION, 'iterate_over': iterate_over,
+                      'metrics': [list(metric) for metric in metrics_to_parse]})
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+class ExtractionCache:
+    def __init__(self, directory_path, metrics_to_parse, iterate_over, rebuild=False):
+        self.directory_path = directory_path
+        self.metrics_hash = metrics_hash(metrics_to_parse, iterate_over)
+        self.num_metrics = len(metrics_to_parse)
+        self.connection = sqlite3.connect(os.path.join(directory_path, CACHE_FILENAME))
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS extractions (
+                path TEXT NOT NULL,
+                metrics_hash TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                num_rows INTEGER NOT NULL,
+                num_values INTEGER NOT NULL,
+                value_data BLOB NOT NULL,
+                PRIMARY KEY (path, metrics_hash)
+            )""")
+        if rebuild:
+            self.connection.execute("DELETE FROM extractions")
+        self.connection.commit()
+        self.pending = 0
+        self.first_pending = 0.0
+
+    def _disable(self, error):
+        logger.warning("Extraction cache disabled: %s", error)
+        try:
+            self.connection.close()
+        except sqlite3.Error:
+            pass
+        self.connection = None
+
+    def _key(self, file_path):
+        return os.path.relpath(file_path, self.directory_path)
+
+    def get(self, file_path, stat):
+        # Returns the cached block, or None if the file is new or has changed.
+        if self.connection is None:
+            return None
+        try:
+            row = self.connection.execute(
+                "SELECT size, mtime_ns, num_rows, num_values, value_data FROM extractions WHERE path = ? AND metrics_hash = ?",
+                (self._key(file_path), self.metrics_hash)).fetchone()
+        except sqlite3.Error as e:
+            self._disable(e)
+            return None
+        if row is None:
+            return None
+        size, mtime_ns, num_rows, num_values, value_data = row
+        if size != stat.st_size or mtime_ns != stat.st_mtime_ns or num_values != self.num_metrics:
+            return None
+        return np.frombuffer(value_data, dtype=np.float64).reshape(num_rows, num_values)
+
+    def put(self, file_path, stat, values):
+        # stat is taken before parsing, so a file modified mid-parse is re-read next time
+        if self.connection is None:
+            return
+        try:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO extractions VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self._key(file_path), self.metrics_hash, stat.st_size, stat.st_mtime_ns,
+                 values.shape[0], values.shape[1], np.ascontiguousarray(values, dtype=np.float64).tobytes()))
+            now = time.perf_counter()
+            if self.pending == 0:
+                self.first_pending = now
+            self.pending += 1
+            if self.pending >= COMMIT_FILES or now - self.first_pending >= COMMIT_SECONDS:
+                self.connection.commit()
+                self.pending = 0
+        except sqlite3.Error as e:
+            self._disable(e)
+
+    def close(self):
+        if self.connection is None:
+            return
+        try:
+            self.connection.commit()
+            self.connection.close()
+        except sqlite3.Error as e:
+            self._disable(e)
@@ -0,0 +1,356 @@
+import argparse
+import logging
+import os
+import sys
+
+import numpy as np
+
+from .export import EXPORT_FORMATS, export_tables
+from .filtering import PHASES, TRIM_METHODS, filter_iterations
+from .history import HISTORY_FILENAME, HistoryStore, change_point, regressions
+from .pipeline import extract, summarize
+from .presets import PRESETS
+from .profiling import Profile, session
+from .significance import CORRECTIONS
+from .stats import OVERALL, print_stats
+
+# Command line entry point: python -m perfstats <command> ...
+#   extract  parse the results tree (filling the extraction cache)
+#   stats    extract, then print the statistics report
+#   plot     extract, print the report and plot it
+#   export   extract, summarize and write both tables to Parquet/Arrow files
+#   report   extract, summarize and write a self-contained HTML report
+#   record   extract, summarize and append the stats to the history store
+#   trend    print the history of one website/metric
+#   regressions
+#            flag series whose latest run regressed against a rolling baseline
+# stats, plot, export, report and record pass the table through the
+# filtering stage first (--warmup, --cold-when, --trim; see filtering.py).
+# Rendering is imported only by the plot command, so extract and stats start
+# without loading matplotlib.
+
+logger = logging.getLogger('perfstats')
+
+PLOT_TYPES = ('scatter', 'box', 'violin')
+FORMATS = ('png', 'svg', 'pdf')
+
+
+def _extract_options():
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('directory_path', help="root of the <website>/<variant>/browsertime.json tree")
+    parser.add_argument('-m', '--metrics', default='asyncopen',
+                        help=f"metric preset ({', '.join(PRESETS)}) or a JSON/YAML metric set file (default: asyncopen)")
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help="number of processes used to parse browsertime.json files and render figures (default: 1)")
+    parser.add_argument('--stream', action='store_true',
+                        help="parse incrementally, keeping only the perfstats used by the metrics (requires ijson)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="don't read or write the extraction cache in the results directory")
+    parser.add_argument('--rebuild-cache', action='store_true',
+                        help="discard the extraction cache and re-parse every file")
+    return parser
+
+
+def _output_options():
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('-v', '--verbose', action='store_true', help="log every file as it is loaded")
+    parser.add_argument('-q', '--quiet', action='store_true', help="only log warnings and errors")
+    parser.add_argument('--no-progress', action='store_true', help="don't draw the progress bar")
+    parser.add_argument('--profile', action='store_true',
+                        help="log per-stage timings, the parse cost per file and the slowest files")
+    parser.add_argument('--profile-cprofile', metavar='FILE',
+                        help="also write cProfile stats of the main process to FILE (implies --profile)")
+    parser.add_argument('--profile-memory', action='store_true',
+                        help="also trace allocations: per-stage peak memory and the largest allocation sites "
+                             "(implies --profile; slows the run down)")
+    return parser
+
+
+def _stats_options():
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--baseline',
+                        help="variant to compare against (default: the first variant in sort order)")
+    parser.add_argument('--correction', default='none', choices=CORRECTIONS,
+                        help="multiple-comparison correction applied to the Mann-Whitney p-values")
+    parser.add_argument('--bootstrap-samples', type=int, default=2000,
+                        help="bootstrap resamples for the median delta confidence interval (0 to skip)")
+    parser.add_argument('--paired', action='store_true',
+                        help="pair each iteration with the baseline's iteration of the same run and index, "
+                             "and test the per-iteration deltas (Wilcoxon signed-rank)")
+    return parser
+
+
+def _filter_options():
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--warmup', type=int, default=0, metavar='K',
+                        help="drop the first K iterations of every browsertime.json")
+    parser.add_argument('--cold-when', metavar='CONDITION',
+                        help="tag iterations as cold when CONDITION holds and report cold and warm iterations "
+                             "separately, e.g. 'geckoPerfStats.DNSLookupNetworkFirst > 0'")
+    parser.add_argument('--trim', choices=TRIM_METHODS,
+                        help="drop outliers per website, variant and metric (iqr: outside k*IQR of the quartiles, "
+                             "mad: more than k scaled MADs from the median)")
+    parser.add_argument('--trim-k', type=float,
+                        help="outlier threshold k (default: 1.5 for iqr, 3.5 for mad)")
+    return parser
+
+
+def build_parser(plot_defaults=None):
+    # plot_defaults: overrides for the plot command's defaults, used by the
+    # compatibility scripts (e.g. {'plot_type': 'box'})
+    parser = argparse.ArgumentParser(prog='perfstats', description="Perfstats from comparative browsertime runs")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    extract_options = _extract_options()
+    output_options = _output_options()
+    stats_options = _stats_options()
+    filter_options = _filter_options()
+
+    extract_parser = subparsers.add_parser('extract', parents=[extract_options, output_options],
+                                           help="parse the results tree into the long-format table")
+    extract_parser.add_argument('-o', '--output', help="write the long-format table to this CSV file")
+    extract_parser.set_defaults(func=run_extract)
+
+    stats_parser = subparsers.add_parser('stats', parents=[extract_options, output_options, filter_options, stats_options],
+                                         help="print summary statistics and significance")
+    stats_parser.set_defaults(func=run_stats)
+
+    plot_parser = subparsers.add_parser('plot', parents=[extract_options, output_options, filter_options, stats_options],
+                                        help="print the statistics and plot every website")
+    plot_parser.add_argument('--type', dest='plot_type', default='violin', choices=PLOT_TYPES,
+                             help="kind of plot (default: violin)")
+    plot_parser.add_argument('--headless', action='store_true',
+                             help="render with the Agg backend without showing figures; per-website figures use --jobs processes")
+    plot_parser.add_argument('--output-dir',
+                             help="save figures to this directory (default: only show them, or 'plots' with --headless)")
+    plot_parser.add_argument('--format', default='png', choices=FORMATS)
+    plot_parser.add_argument('--dpi', type=int, default=300)
+    plot_parser.set_defaults(func=run_plot, **(plot_defaults or {}))
+
+    export_parser = subparsers.add_parser('export', parents=[extract_options, output_options, filter_options, stats_options],
+                                          help="write the values and stats tables to Parquet or Arrow IPC files")
+    export_parser.add_argument('-o', '--output-dir', default='export',
+                               help="directory for values.<ext> and stats.<ext> (default: export)")
+    export_parser.add_argument('--format', default='parquet', choices=EXPORT_FORMATS)
+    export_parser.add_argument('--partition-by-website', action='store_true',
+                               help="write the values as a dataset partitioned by website (values/Website=<site>/)")
+    export_parser.set_defaults(func=run_export)
+
+    report_parser = subparsers.add_parser('report', parents=[extract_options, output_options, filter_options, stats_options],
+                                          help="write a self-contained interactive HTML report")
+    report_parser.add_argument('-o', '--output', default='perfstats_report.html',
+                               help="HTML file to write (default: perfstats_report.html)")
+    report_parser.add_argument('--bins', type=int, default=40, help="histogram bins per distribution (default: 40)")
+    report_parser.add_argument('--title', help="report title (default: the results directory)")
+    report_parser.set_defaults(func=run_report)
+
+    history_options = argparse.ArgumentParser(add_help=False)
+    history_options.add_argument('--history', default=HISTORY_FILENAME,
+                                 help=f"history store (default: {HISTORY_FILENAME})")
+    history_options.add_argument('--phase', choices=PHASES, default='',
+                                 help="query the cold or warm rows of runs recorded with --cold-when")
+
+    record_parser = subparsers.add_parser('record', parents=[extract_options, output_options, filter_options, stats_options],
+                                          help="append the stats of this tree to the history store")
+    record_parser.add_argument('--label', required=True, help="build or run label, e.g. a build id")
+    record_parser.add_argument('--date', help="ISO 8601 date of the run, UTC unless it has an offset (default: now)")
+    record_parser.add_argument('--history', default=HISTORY_FILENAME,
+                               help=f"history store (default: {HISTORY_FILENAME})")
+    record_parser.set_defaults(func=run_record)
+
+    trend_parser = subparsers.add_parser('trend', parents=[output_options, history_options],
+                                         help="print the recorded history of one website and metric")
+    trend_parser.add_argument('metric')
+    trend_parser.add_argument('--website', default=OVERALL, help=f"(default: {OVERALL})")
+    trend_parser.add_argument('--variant')
+    trend_parser.add_argument('--since', help="ISO 8601 date, UTC unless it has an offset")
+    trend_parser.add_argument('--until', help="ISO 8601 date, UTC unless it has an offset")
+    trend_parser.set_defaults(func=run_trend)
+
+    regressions_parser = subparsers.add_parser('regressions', parents=[output_options, history_options],
+                                               help="flag series whose latest median regressed against a rolling baseline")
+    regressions_parser.add_argument('--window', type=int, default=7,
+                                    help="number of previous runs in the rolling baseline (default: 7)")
+    regressions_parser.add_argument('--threshold', type=float, default=5.0,
+                                    help="minimum increase of the median over the baseline, in percent (default: 5)")
+    regressions_parser.add_argument('--min-z', type=float, default=3.0,
+                                    help="minimum increase in robust standard deviations of the baseline runs (default: 3)")
+    regressions_parser.add_argument('--min-history', type=int, default=3,
+                                    help="skip series with fewer previous runs (default: 3)")
+    regressions_parser.set_defaults(func=run_regressions)
+    return parser
+
+
+def _extract(args):
+    if not os.path.isdir(args.directory_path):
+        raise ValueError(f"{args.directory_path} is not a directory")
+    cold_when = getattr(args, 'cold_when', None)
+    df = extract(args.directory_path, args.metrics, jobs=args.jobs, stream=args.stream,
+                 use_cache=not args.no_cache, rebuild_cache=args.rebuild_cache, progress=args.progress,
+                 profile=args.profiler, cold_when=cold_when)
+    if hasattr(args, 'warmup') and (args.warmup or cold_when or args.trim):
+        with args.profiler.stage('filter'):
+            df = filter_iterations(df, warmup=args.warmup, cold_when=cold_when, trim=args.trim, trim_k=args.trim_k)
+    return df
+
+
+def _stats(args, df):
+    return summarize(df, baseline=args.baseline, correction=args.correction,
+                     bootstrap_samples=args.bootstrap_samples, paired=args.paired, profile=args.profiler)
+
+
+def _summarize(args, df):
+    stats = _stats(args, df)
+    with args.profiler.stage('report'):
+        print_stats(stats, baseline=args.baseline)
+    return stats
+
+
+def run_extract(args):
+    df = _extract(args)
+    print(f"Extracted {len(df)} values: {df['Website'].nunique()} websites, "
+          f"{df['Variant'].nunique()} variants, {df['Metric'].nunique()} metrics")
+    if args.output:
+        with args.profiler.stage('write csv'):
+            df.to_csv(args.output, index=False)
+        logger.info("Wrote %s", args.output)
+
+
+def run_stats(args):
+    _summarize(args, _extract(args))
+
+
+def run_plot(args):
+    from .render import render_figures
+
+    df = _extract(args)
+    stats = _summarize(args, df)
+    output_dir = args.output_dir
+    if args.headless and output_dir is None:
+        output_dir = 'plots'
+    metric_names = list(df['Metric'].cat.categories)
+    if 'Phase' not in df.columns:
+        with args.profiler.stage('render'):
+            render_figures(df, stats, metric_names, args.plot_type, output_dir=output_dir, fmt=args.format,
+                           dpi=args.dpi, headless=args.headless, jobs=args.jobs)
+        return
+    # cold and warm iterations are plotted separately, into <output_dir>/<phase>
+    for phase, phase_df in df.groupby('Phase', observed=True):
+        logger.info("Plotting %s iterations", phase)
+        with args.profiler.stage('render'):
+            render_figures(phase_df, stats[stats['Phase'] == phase], metric_names, args.plot_type,
+                           output_dir=output_dir and os.path.join(output_dir, phase), fmt=args.format,
+                           dpi=args.dpi, headless=args.headless, jobs=args.jobs)
+
+
+def run_export(args):
+    df = _extract(args)
+    stats = _stats(args, df)
+    with args.profiler.stage('export'):
+        paths = export_tables(df, stats, args.output_dir, fmt=args.format,
+                              partition_by_website=args.partition_by_website)
+    for path in paths:
+        logger.info("Wrote %s", path)
+
+
+def run_report(args):
+    from .report import write_report
+
+    df = _extract(args)
+    stats = _stats(args, df)
+    title = args.title or f"perfstats: {os.path.basename(os.path.abspath(args.directory_path))}"
+    with args.profiler.stage('report'):
+        write_report(df, stats, args.output, bins=args.bins, title=title)
+    logger.info("Wrote %s (%.1f kB)", args.output, os.path.getsize(args.output) / 1e3)
+
+
+def run_record(args):
+    df = _extract(args)
+    stats = _stats(args, df)
+    store = HistoryStore(args.history)
+    try:
+        with args.profiler.stage('record'):
+            run_id = store.record(stats, args.label, date=args.date, root=args.directory_path, metric_set=args.metrics)
+    finally:
+        store.close()
+    logger.info("Recorded run %d (%s, %d rows) in %s", run_id, args.label, len(stats), args.history)
+
+
+def _open_history(path):
+    if not os.path.exists(path):
+        raise ValueError(f"history store {path} does not exist; add runs with 'perfstats record'")
+    return HistoryStore(path)
+
+
+def run_trend(args):
+    store = _open_history(args.history)
+    try:
+        trend = store.trend(args.website, args.metric, variant=args.variant, phase=args.phase,
+                            since=args.since, until=args.until)
+    finally:
+        store.close()
+    if trend.empty:
+        raise ValueError(f"no history for {args.metric} on {args.website}")
+    for variant, series in trend.groupby('variant', sort=False):
+        print(f"{args.metric} - {args.website} - {variant}:")
+        for row in series.itertuples(index=False):
+            delta = '' if row.median_delta_pct is None or np.isnan(row.median_delta_pct) else f"  ({row.median_delta_pct:+.2f}% vs {row.baseline})"
+            print(f"  {row.date}  {row.label:<20} Median: {row.median:.3f}  Mean: {row.mean:.3f}  Count: {row.count}{delta}")
+        split, t = change_point(series['median'].to_numpy())
+        if split is not None:
+            before, after = series['median'].iloc[:split].mean(), series['median'].iloc[split:].mean()
+            print(f"  Most likely change point: before {series['label'].iloc[split]} ({series['date'].iloc[split]}), "
+                  f"mean median {before:.3f} -> {after:.3f} (t = {t:.1f})")
+
+
+def run_regressions(args):
+    store = _open_history(args.history)
+    try:
+        recent = store.recent(args.window, phase=args.phase)
+    finally:
+        store.close()
+    flagged = regressions(recent, threshold_pct=args.threshold, min_z=args.min_z, min_history=args.min_history)
+    if flagged.empty:
+        print(f"No regressions against the previous {args.window} runs")
+        return
+    print(f"{len(flagged)} regressions against the previous {args.window} runs:")
+    for row in flagged.itertuples(index=False):
+        print(f"  {row.metric} - {row.website} - {row.variant}: Median {row.median:.3f} vs baseline {row.baseline_median:.3f} "
+              f"({row.delta_pct:+.2f}%, z = {row.z:.1f}, {row.history} runs) in {row.label} ({row.date})")
+
+
+def _configure_logging(args):
+    level = logging.DEBUG if args.verbose else logging.WARNING if args.quiet else logging.INFO
+    logging.basicConfig(level=level, stream=sys.stderr,
+                        format='%(levelname)s %(name)s: %(message)s' if args.verbose else '%(message)s')
+    # the progress bar redraws one line, so it is only drawn on a terminal
+    # and not interleaved with per-file debug logging
+    args.progress = not (args.no_progress or args.quiet or args.verbose) and sys.stderr.isatty()
+
+
+def legacy_plot_argv(argv):
+    # The compatibility scripts took the plot type as a positional after the
+    # directory (script <directory_path> [plot_type]); map it onto --type.
+    _, extras = build_parser().parse_known_args(argv)
+    plot_types = [arg for arg in extras if arg in PLOT_TYPES]
+    if not plot_types:
+        return argv
+    index = len(argv) - 1 - argv[::-1].index(plot_types[-1])
+    return argv[:index] + argv[index + 1:] + ['--type', plot_types[-1]]
+
+
+def main(argv=None, plot_defaults=None):
+    parser = build_parser(plot_defaults)
+    args = parser.parse_args(argv)
+    _configure_logging(args)
+    args.profiler = Profile()
+    profiling = args.profile or args.profile_cprofile or args.profile_memory
+    try:
+        if profiling:
+            with session(args.profiler, cprofile_path=args.profile_cprofile, memory=args.profile_memory):
+                args.func(args)
+        else:
+            args.func(args)
+    except ValueError as e:
+        logger.error("perfstats: error: %s", e)
+        return 1
+    return 0
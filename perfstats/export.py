@@ -0,0 +1,75 @@
+import os
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# Export stage: writes the long-format values table and the aggregated stats
+# table to Parquet or Arrow IPC files, so notebooks and dashboards can read
+# (or memory-map) them instead of re-parsing browsertime.json.
+#
+#   <output_dir>/values.parquet   one row per extracted value
+#   <output_dir>/stats.parquet    the table printed by print_stats
+#
+# String label columns are dictionary-encoded. With partition_by_website the
+# values are written as a hive-partitioned dataset instead,
+# <output_dir>/values/Website=<site>/part-0.parquet, so a reader can load a
+# single website without touching the rest (site names are URI-encoded in
+# the directory names and decoded again by hive partitioning).
+#
+# Arrow IPC files are written uncompressed so they can be memory-mapped:
+#   pa.ipc.open_file(pa.memory_map(path)).read_all()
+
+EXPORT_FORMATS = ('parquet', 'arrow')
+_EXTENSIONS = {'parquet': 'parquet', 'arrow': 'arrow'}
+_DATASET_FORMATS = {'parquet': 'parquet', 'arrow': 'ipc'}
+
+
+def _to_arrow(df):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # Categorical columns already arrive as dictionaries; encode the plain
+    # string columns (e.g. Website/Variant/Metric in the stats table) too.
+    for i, field in enumerate(table.schema):
+        if pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+            table = table.set_column(i, field.name, table.column(i).dictionary_encode())
+    return table
+
+
+def _write_file(table, path, fmt):
+    if fmt == 'parquet':
+        pq.write_table(table, path)
+    else:
+        with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+def export_tables(df, stats, output_dir, fmt='parquet', partition_by_website=False):
+    # Returns the list of paths written.
+    if pa is None:
+        raise ValueError("pyarrow is required to export Parquet/Arrow files")
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"unknown export format {fmt!r} (expected one of {', '.join(EXPORT_FORMATS)})")
+    os.makedirs(output_dir, exist_ok=True)
+    extension = _EXTENSIONS[fmt]
+    written = []
+
+    values = _to_arrow(df)
+    if partition_by_website:
+        values_path = os.path.join(output_dir, 'values')
+        ds.write_dataset(values, values_path, format=_DATASET_FORMATS[fmt],
+                         partitioning=['Website'], partitioning_flavor='hive',
+                         basename_template='part-{i}.' + extension,
+                         existing_data_behavior='delete_matching')
+    else:
+        values_path = os.path.join(output_dir, 'values.' + extension)
+        _write_file(values, values_path, fmt)
+    written.append(values_path)
+
+    if stats is not None:
+        stats_path = os.path.join(output_dir, 'stats.' + extension)
+        _write_file(_to_arrow(stats), stats_path, fmt)
+        written.append(stats_path)
+    return written
@@ -0,0 +1,126 @@
+import logging
+import re
+
+import numpy as np
+import pandas as pd
+
+from .metrics import compile_metric
+
+logger = logging.getLogger(__name__)
+
+# Filtering stage, applied to the long-format table between extraction and
+# aggregation. All steps are vectorized over the table:
+#
+#   warm-up     drop the first K iterations of every browsertime.json
+#   phases      tag each iteration 'cold' or 'warm' from a perfstat signal,
+#               e.g. --cold-when "geckoPerfStats.DNSLookupNetworkFirst > 0".
+#               The signal is extracted as an extra COLD_SIGNAL metric (see
+#               add_cold_signal) and removed again once the Phase column is
+#               set; the report then shows cold and warm iterations
+#               separately.
+#   outliers    drop values outside [Q1 - k*IQR, Q3 + k*IQR] ('iqr', k=1.5)
+#               or more than k scaled MADs from the median ('mad', k=3.5),
+#               per (Website, Variant, Metric[, Phase]) cell.
+
+COLD_SIGNAL = '_cold_signal'
+PHASES = ('cold', 'warm')
+TRIM_METHODS = ('iqr', 'mad')
+DEFAULT_TRIM_K = {'iqr': 1.5, 'mad': 3.5}
+
+# scales the MAD to the standard deviation of a normal distribution
+MAD_SCALE = 1.4826
+
+_CONDITION = re.compile(r'^(.+?)\s*(>=|<=|==|!=|>|<)\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)$')
+_OPERATORS = {
+    '>': np.greater, '>=': np.greater_equal, '<': np.less,
+    '<=': np.less_equal, '==': np.equal, '!=': np.not_equal,
+}
+
+
+def parse_condition(condition):
+    # "geckoPerfStats.DNSLookupNetworkFirst > 0" -> ('geckoPerfStats.DNSLookupNetworkFirst', '>', 0.0)
+    match = _CONDITION.match(condition.strip())
+    if match is None:
+        raise ValueError(f"invalid cold condition {condition!r}, expected '<metric or spec> <op> <number>'")
+    return match.group(1), match.group(2), float(match.group(3))
+
+
+def add_cold_signal(metric_set, condition):
+    # Returns a copy of metric_set that also extracts the signal of
+    # condition as COLD_SIGNAL. The left-hand side may name a metric of the
+    # set or be a metric spec of its own.
+    signal, _, _ = parse_condition(condition)
+    spec = dict(metric_set['metrics']).get(signal, signal)
+    try:
+        compile_metric(spec)
+    except ValueError as e:
+        raise ValueError(f"cold condition {condition!r}: {signal!r} is neither a metric of the set nor a valid spec ({e})") from None
+    return {**metric_set, 'metrics': metric_set['metrics'] + [[COLD_SIGNAL, spec]]}
+
+
+def drop_warmup(df, num_iterations):
+    # position of each iteration within its file
+    first = df.groupby('Source', observed=True)['Iteration'].transform('min')
+    return df[(df['Iteration'] - first).to_numpy() >= num_iterations]
+
+
+def tag_phases(df, condition):
+    # Adds a categorical Phase column and drops the COLD_SIGNAL rows.
+    # Iterations without a signal value count as warm.
+    _, operator, threshold = parse_condition(condition)
+    keys = ['Website', 'Variant', 'Run', 'Iteration']
+    is_signal = (df['Metric'] == COLD_SIGNAL).to_numpy()
+    signal = df.loc[is_signal, keys + ['Value']]
+    with np.errstate(invalid='ignore'):
+        signal = signal.assign(cold=_OPERATORS[operator](signal['Value'].to_numpy(), threshold))
+    values = df[~is_signal]
+    cold = pd.MultiIndex.from_frame(values[keys]).isin(pd.MultiIndex.from_frame(signal.loc[signal['cold'], keys]))
+    values = values.assign(Phase=pd.Categorical.from_codes(np.where(cold, 0, 1), categories=PHASES))
+    values['Metric'] = values['Metric'].cat.remove_categories([COLD_SIGNAL])
+    return values
+
+
+def trim_outliers(df, method, k=None):
+    if method not in TRIM_METHODS:
+        raise ValueError(f"unknown trim method {method!r} (expected one of {', '.join(TRIM_METHODS)})")
+    if k is None:
+        k = DEFAULT_TRIM_K[method]
+    keys = ['Website', 'Variant', 'Metric'] + (['Phase'] if 'Phase' in df.columns else [])
+    values = df['Value']
+    groups = values.groupby([df[key] for key in keys], observed=True)
+    if method == 'iqr':
+        q1 = groups.transform('quantile', 0.25)
+        q3 = groups.transform('quantile', 0.75)
+        low, high = q1 - k * (q3 - q1), q3 + k * (q3 - q1)
+    else:
+        median = groups.transform('median')
+        deviation = (values - median).abs()
+        mad = deviation.groupby([df[key] for key in keys], observed=True).transform('median') * MAD_SCALE
+        low, high = median - k * mad, median + k * mad
+    # missing values are kept; aggregation ignores them
+    keep = values.isna() | ((values >= low) & (values <= high))
+    return df[keep.to_numpy()]
+
+
+def _num_values(df):
+    return int((df['Value'].notna() & (df['Metric'] != COLD_SIGNAL)).sum())
+
+
+def filter_iterations(df, warmup=0, cold_when=None, trim=None, trim_k=None):
+    # cold_when requires the table to contain the COLD_SIGNAL metric, i.e. to
+    # be extracted with add_cold_signal(metric_set, cold_when).
+    num_values = _num_values(df)
+    if warmup > 0:
+        df = drop_warmup(df, warmup)
+    num_kept = _num_values(df)
+    if cold_when is not None:
+        df = tag_phases(df, cold_when)
+    if trim is not None:
+        df = trim_outliers(df, trim, trim_k)
+    line = f"Filtering: {num_values - num_kept} warm-up values dropped, {num_kept - _num_values(df)} outliers trimmed"
+    if cold_when is not None:
+        iterations = df[['Website', 'Variant', 'Run', 'Iteration', 'Phase']].drop_duplicates()
+        counts = iterations['Phase'].value_counts()
+        line += f", {counts['cold']} cold / {counts['warm']} warm iterations"
+    logger.info(line)
+    return df.reset_index(drop=True)
@@ -0,0 +1,198 @@
+import datetime
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from .filtering import MAD_SCALE
+
+# Cross-run history.
+# An append-only SQLite file that records the stats table of every recorded
+# extraction under a build label and date, so nightly runs can be compared
+# over months:
+#
+#   runs     one row per recorded extraction (label, date, results root,
+#            metric set)
+#   stats    the stats table rows of each run; the (website, metric, variant,
+#            phase, date) index makes a trend query a single index range scan
+#
+# Dates are stored in UTC; dates given without an offset are taken to be
+# UTC. Rows that were not split into cold/warm phases have phase ''. The
+# overall rollup is stored with website 'Overall' like in the stats table.
+#
+# regressions() compares the latest median of every series with a rolling
+# baseline, the median of its previous `window` medians, and flags increases
+# above a relative threshold that are also large compared with the
+# baseline's run-to-run noise (robust z-score from the MAD). change_point()
+# finds the most likely shift in a series.
+
+HISTORY_FILENAME = 'perfstats_history.sqlite'
+HISTORY_VERSION = 1
+
+STAT_COLUMNS = ('mean', 'median', 'min', 'max', 'std', 'count', 'baseline', 'mean_delta_pct',
+                'median_delta_pct', 'p_value', 'p_adjusted')
+
+
+def _format_date(value):
+    # Dates are stored in UTC as YYYY-MM-DDTHH:MM:SS+00:00, so they compare
+    # and sort correctly as text; naive datetimes are taken to be UTC.
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value.astimezone(datetime.timezone.utc).isoformat(timespec='seconds')
+
+
+def _normalize_date(date):
+    if date is None:
+        return _format_date(datetime.datetime.now(datetime.timezone.utc))
+    try:
+        return _format_date(datetime.datetime.fromisoformat(date))
+    except ValueError:
+        raise ValueError(f"invalid date {date!r}, expected ISO 8601 (e.g. 2024-05-01 or 2024-05-01T03:00:00+02:00)") from None
+
+
+class HistoryStore:
+    def __init__(self, path=HISTORY_FILENAME):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, HISTORY_VERSION):
+            raise ValueError(f"{path}: unsupported history version {version}")
+        self.connection.executescript(f"""
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id INTEGER PRIMARY KEY,
+                label TEXT NOT NULL,
+                date TEXT NOT NULL,
+                root TEXT,
+                metric_set TEXT
+            );
+            CREATE TABLE IF NOT EXISTS stats (
+                run_id INTEGER NOT NULL REFERENCES runs(run_id),
+                date TEXT NOT NULL,
+                website TEXT NOT NULL,
+                metric TEXT NOT NULL,
+                variant TEXT NOT NULL,
+                phase TEXT NOT NULL DEFAULT '',
+                mean REAL, median REAL, min REAL, max REAL, std REAL, count INTEGER,
+                baseline TEXT, mean_delta_pct REAL, median_delta_pct REAL,
+                p_value REAL, p_adjusted REAL
+            );
+            CREATE INDEX IF NOT EXISTS stats_series ON stats (website, metric, variant, phase, date);
+            CREATE INDEX IF NOT EXISTS runs_date ON runs (date);
+            PRAGMA user_version = {HISTORY_VERSION};
+        """)
+        self.connection.commit()
+
+    def record(self, stats, label, date=None, root=None, metric_set=None):
+        # Appends one run; returns its run_id.
+        date = _normalize_date(date)
+        with self.connection:
+            run_id = self.connection.execute(
+                "INSERT INTO runs (label, date, root, metric_set) VALUES (?, ?, ?, ?)",
+                (label, date, root and os.path.abspath(root), metric_set)).lastrowid
+            rows = pd.DataFrame({
+                'run_id': run_id,
+                'date': date,
+                'website': stats['Website'].astype(str),
+                'metric': stats['Metric'].astype(str),
+                'variant': stats['Variant'].astype(str),
+                'phase': stats['Phase'].astype(str) if 'Phase' in stats.columns else '',
+            })
+            for column in STAT_COLUMNS:
+                rows[column] = stats[column] if column in stats.columns else None
+            rows = rows.astype(object).where(rows.notna(), None)
+            placeholders = ', '.join('?' * len(rows.columns))
+            self.connection.executemany(
+                f"INSERT INTO stats ({', '.join(rows.columns)}) VALUES ({placeholders})",
+                rows.itertuples(index=False, name=None))
+        return run_id
+
+    def runs(self):
+        return pd.read_sql_query("SELECT * FROM runs ORDER BY date, run_id", self.connection)
+
+    def trend(self, website, metric, variant=None, phase='', since=None, until=None):
+        # The series of one (website, metric[, variant]) in date order.
+        query = ("SELECT s.date, r.label, s.variant, " + ', '.join(f"s.{column}" for column in STAT_COLUMNS) +
+                 " FROM stats s JOIN runs r USING (run_id) WHERE s.website = ? AND s.metric = ?")
+        params = [website, metric]
+        if variant is not None:
+            query += " AND s.variant = ?"
+            params.append(variant)
+        query += " AND s.phase = ?"
+        params.append(phase)
+        if since is not None:
+            query += " AND s.date >= ?"
+            params.append(_normalize_date(since))
+        if until is not None:
+            query += " AND s.date <= ?"
+            params.append(_normalize_date(until))
+        query += " ORDER BY s.variant, s.date, s.run_id"
+        return pd.read_sql_query(query, self.connection, params=params)
+
+    def recent(self, window, phase=''):
+        # The latest window + 1 rows of every series, with recency 1 for the latest.
+        return pd.read_sql_query("""
+            SELECT * FROM (
+                SELECT s.website, s.metric, s.variant, s.date, r.label, s.median,
+                       ROW_NUMBER() OVER (PARTITION BY s.website, s.metric, s.variant
+                                          ORDER BY s.date DESC, s.run_id DESC) AS recency
+                FROM stats s JOIN runs r USING (run_id)
+                WHERE s.phase = ? AND s.median IS NOT NULL
+            ) WHERE recency <= ?""", self.connection, params=(phase, window + 1))
+
+    def close(self):
+        self.connection.close()
+
+
+def regressions(recent, threshold_pct=5.0, min_z=3.0, min_history=3):
+    # recent: HistoryStore.recent(window). Returns one row per series whose
+    # latest median exceeds the rolling baseline by at least threshold_pct
+    # percent and min_z robust standard deviations.
+    keys = ['website', 'metric', 'variant']
+    latest = recent[recent['recency'] == 1].set_index(keys)
+    previous = recent[recent['recency'] > 1]
+    medians = previous.groupby(keys)['median']
+    deviation = (previous['median'] - medians.transform('median')).abs()
+    summary = pd.DataFrame({
+        'baseline_median': medians.median(),
+        'noise': deviation.groupby([previous[key] for key in keys]).median() * MAD_SCALE,
+        'history': medians.size(),
+    })
+    table = latest.join(summary, how='inner')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        table['delta_pct'] = (table['median'] - table['baseline_median']) / table['baseline_median'].abs() * 100
+        difference = table['median'] - table['baseline_median']
+        table['z'] = np.where(table['noise'] > 0, difference / table['noise'], np.where(difference > 0, np.inf, 0))
+    flagged = ((table['history'] >= min_history) & (table['delta_pct'] >= threshold_pct) & (table['z'] >= min_z))
+    columns = ['date', 'label', 'median', 'baseline_median', 'delta_pct', 'z', 'history']
+    return table.loc[flagged, columns].sort_values('delta_pct', ascending=False).reset_index()
+
+
+def change_point(values):
+    # Index i that best splits values into values[:i] and values[i:] with
+    # different means (the maximum of the two-sample t statistic over all
+    # splits), and that statistic; (None, 0) for fewer than 4 values or when
+    # no split changes the mean. A noiseless step has t = inf.
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if n < 4:
+        return None, 0.0
+    splits = np.arange(2, n - 1)
+    cumulative = np.cumsum(values)
+    cumulative_squares = np.cumsum(values ** 2)
+    left_n, right_n = splits, n - splits
+    left_mean = cumulative[splits - 1] / left_n
+    right_mean = (cumulative[-1] - cumulative[splits - 1]) / right_n
+    left_ss = cumulative_squares[splits - 1] - left_n * left_mean ** 2
+    right_ss = (cumulative_squares[-1] - cumulative_squares[splits - 1]) - right_n * right_mean ** 2
+    pooled = np.maximum(left_ss + right_ss, 0) / (n - 2)
+    # differences at the level of rounding error (e.g. a flat series) are no change
+    difference = np.abs(right_mean - left_mean)
+    difference[difference <= 1e-12 * np.abs(values).max()] = 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = difference / np.sqrt(pooled * (1 / left_n + 1 / right_n))
+    t = np.where(np.isnan(t), 0, t)
+    best = int(np.argmax(t))
+    if not t[best] > 0:
+        return None, 0.0
+    return int(splits[best]), float(t[best])
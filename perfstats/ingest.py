@@ -0,0 +1,336 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from .cache import ExtractionCache
+from .metrics import compile_metrics, referenced_paths
+from .profiling import Profile, ProgressBar
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+logger = logging.getLogger(__name__)
+
+# Shared ingestion layer for the plot scripts.
+# Rows are appended into typed column buffers (int32 category codes for
+# Website/Variant/Metric/Source, int32 Run and Iteration buffers and a
+# float64 value buffer) and the long-format
+# DataFrame is built once at the end, instead of pd.concat'ing one row at a
+# time, which copies the whole frame on every append.
+#
+# Each browsertime.json is reduced to a compact (iterations x metrics)
+# float64 block by extract_file, either in-process or in a worker pool
+# (load_results(..., jobs=N)); only those blocks cross the process boundary.
+#
+# Files are parsed with orjson when it is installed. With stream=True they
+# are parsed incrementally with ijson, and only the paths the metric specs
+# reference are materialized, so memory does not grow with the size of the
+# unrelated parts of browsertime.json (browserScripts, visualMetrics, ...).
+#
+# Extracted blocks are cached in an SQLite file at the root of the tree (see
+# cache.py), so re-runs only parse new or changed files.
+
+LABEL_COLUMNS = ('Website', 'Variant', 'Metric', 'Source')
+# Run: the run ordinal (<variant>_runN directories are run N of <variant>,
+# a plain <variant> directory is run 1). Iteration: the iteration's position
+# within its run directory, counting on across files and entries, so
+# (Website, Variant, Run, Iteration) identifies one page load and
+# iteration N of one variant can be paired with iteration N of another.
+INDEX_COLUMNS = ('Run', 'Iteration')
+COLUMNS = ('Website', 'Variant', 'Run', 'Iteration', 'Metric', 'Value', 'Source')
+# Websites, variants and sources are sorted lexically so groupby keeps the
+# ordering the reports rely on ("first variant" is the alphabetically first
+# one); metrics keep the order they were defined in.
+SORTED_COLUMNS = ('Website', 'Variant', 'Source')
+
+_RUN_SUFFIX = re.compile(r'^(.+)_run(\d+)$')
+
+
+def split_run(variant_directory):
+    # 'dns_prefetch_run2' -> ('dns_prefetch', 2), 'dns_prefetch' -> ('dns_prefetch', 1)
+    match = _RUN_SUFFIX.match(variant_directory)
+    if match is None:
+        return variant_directory, 1
+    return match.group(1), int(match.group(2))
+
+
+class LongFrameBuilder:
+    def __init__(self):
+        self._categories = {column: {} for column in LABEL_COLUMNS}
+        self._codes = {column: array('i') for column in LABEL_COLUMNS}
+        self._indices = {column: array('i') for column in INDEX_COLUMNS}
+        self._values = array('d')
+
+    def __len__(self):
+        return len(self._values)
+
+    def _code(self, column, label):
+        categories = self._categories[column]
+        code = categories.get(label)
+        if code is None:
+            code = categories[label] = len(categories)
+        return code
+
+    def append(self, website, variant, metric, value, iteration=0, run=1, source=''):
+        self._codes['Website'].append(self._code('Website', website))
+        self._codes['Variant'].append(self._code('Variant', variant))
+        self._codes['Metric'].append(self._code('Metric', metric))
+        self._codes['Source'].append(self._code('Source', source))
+        self._indices['Run'].append(run)
+        self._indices['Iteration'].append(iteration)
+        self._values.append(np.nan if value is None else value)
+
+    def extend_block(self, website, variant, metric_names, values, first_iteration=0, run=1, source=''):
+        # values: float64 array of shape (iterations, len(metric_names)); row r
+        # is iteration first_iteration + r
+        num_rows = values.shape[0]
+        if num_rows == 0:
+            return
+        metric_codes = np.array([self._code('Metric', name) for name in metric_names], dtype=np.int32)
+        for column, label in (('Website', website), ('Variant', variant), ('Source', source)):
+            self._codes[column].frombytes(np.full(values.size, self._code(column, label), dtype=np.int32).tobytes())
+        self._codes['Metric'].frombytes(np.tile(metric_codes, num_rows).tobytes())
+        self._indices['Run'].frombytes(np.full(values.size, run, dtype=np.int32).tobytes())
+        iterations = np.arange(first_iteration, first_iteration + num_rows, dtype=np.int32)
+        self._indices['Iteration'].frombytes(np.repeat(iterations, len(metric_names)).tobytes())
+        self._values.frombytes(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+
+    def build(self):
+        columns = {}
+        for column in LABEL_COLUMNS:
+            labels = list(self._categories[column])
+            codes = np.frombuffer(self._codes[column], dtype=np.int32) if len(self) else np.empty(0, dtype=np.int32)
+            categorical = pd.Categorical.from_codes(codes, categories=labels)
+            if column in SORTED_COLUMNS:
+                categorical = categorical.reorder_categories(sorted(labels))
+            columns[column] = categorical
+        for column in INDEX_COLUMNS:
+            columns[column] = np.frombuffer(self._indices[column], dtype=np.int32).copy() if len(self) else np.empty(0, dtype=np.int32)
+        values = np.frombuffer(self._values, dtype=np.float64) if len(self) else np.empty(0, dtype=np.float64)
+        columns['Value'] = values.copy()
+        return pd.DataFrame({column: columns[column] for column in COLUMNS})
+
+
+def load_json(file_path):
+    if orjson is not None:
+        with open(file_path, 'rb') as file:
+            return orjson.loads(file.read())
+    with open(file_path, 'r') as file:
+        data = json.load(file)
+    return data
+
+
+_IJSON_SCALAR_EVENTS = frozenset(('null', 'boolean', 'integer', 'double', 'number', 'string'))
+# JSON type of the value an event starts, and of a fully parsed value
+_IJSON_EVENT_TYPES = {
+    'start_map': 'object', 'start_array': 'array', 'null': 'null', 'boolean': 'boolean',
+    'integer': 'number', 'double': 'number', 'number': 'number', 'string': 'string',
+}
+_JSON_TYPES = {dict: 'object', list: 'array', type(None): 'null', bool: 'boolean', int: 'number', float: 'number', str: 'string'}
+
+
+def _structure_error(name, found):
+    # Message for a browsertime.json that is not a list of result objects
+    # with a list of iterations. name: None for the top level, 'item' for a
+    # result, else the per-iteration list; found: a parsed value's type or an
+    # ijson event name.
+    found = _IJSON_EVENT_TYPES.get(found) or _JSON_TYPES.get(found, 'value')
+    if name is None:
+        return f"expected a list of browsertime results, got a JSON {found}"
+    if name == 'item':
+        return f"expected browsertime results to be objects, got a JSON {found}"
+    return f"expected {name} to be a list, got a JSON {found}"
+
+
+def load_selected(file_path, paths, iterate_over):
+    # Streams browsertime.json and returns entries holding only `paths`
+    # (tuples from metrics.referenced_paths), e.g.
+    #   [{'geckoPerfStats': [{'trr_dns_start': 1.0}, ...], 'browserScripts': [...]}]
+    # Every element of the per-iteration lists gets a (possibly empty) dict so
+    # the iteration count matches the full parse.
+    list_names = {path[0] for path in paths} | {iterate_over}
+    item_prefixes = {f"item.{name}.item": name for name in list_names}
+    leaf_prefixes = {'.'.join(('item', path[0], 'item') + path[1:]): path for path in paths}
+    iterate_prefix = f"item.{iterate_over}"
+
+    entries = []
+    with open(file_path, 'rb') as file:
+        try:
+            for prefix, event, value in ijson.parse(file, use_float=True):
+                # the same structure checks as extract_entries
+                if prefix == '' and event != 'start_array' and event != 'end_array':
+                    raise ValueError(f"{file_path}: {_structure_error(None, event)}")
+                if prefix == 'item' and (event == 'start_array' or event in _IJSON_SCALAR_EVENTS):
+                    raise ValueError(f"{file_path}: {_structure_error('item', event)}")
+                if prefix == iterate_prefix and event in _IJSON_EVENT_TYPES and event != 'start_array':
+                    raise ValueError(f"{file_path}: {_structure_error(iterate_over, event)}")
+                if prefix == 'item' and event == 'start_map':
+                    entries.append({name: [] for name in list_names})
+                elif prefix in item_prefixes and (event == 'start_map' or event == 'start_array' or event in _IJSON_SCALAR_EVENTS):
+                    entries[-1][item_prefixes[prefix]].append({})
+                elif prefix in leaf_prefixes and event in _IJSON_SCALAR_EVENTS:
+                    path = leaf_prefixes[prefix]
+                    node = entries[-1][path[0]][-1]
+                    for key in path[1:-1]:
+                        node = node.setdefault(key, {})
+                    node[path[-1]] = value
+        except ijson.JSONError as e:
+            # e.g. a truncated file from a run that was killed mid-write; the
+            # yajl backends append a multi-line excerpt to the first line
+            message = str(e).strip().splitlines()
+            raise ValueError(f"{file_path}: {message[0] if message else type(e).__name__}") from None
+    return entries
+
+
+def find_result_files(directory_path):
+    # Yields (website, variant, run, file_path) for <website>/<variant>[_runN]/*.json
+    for root, _, filenames in os.walk(directory_path):
+        website_name = os.path.basename(os.path.dirname(root))
+        variant, run = split_run(os.path.basename(root))
+        for filename in sorted(filenames):
+            if filename.endswith('.json'):
+                yield website_name, variant, run, os.path.join(root, filename)
+
+
+@lru_cache(maxsize=None)
+def _compiled_metrics(metric_specs):
+    return compile_metrics(metric_specs)
+
+
+@lru_cache(maxsize=None)
+def _referenced_paths(metric_specs):
+    return frozenset(referenced_paths(metric_specs))
+
+
+def extract_entries(data, compiled_metrics, iterate_over):
+    # Evaluates compiled metrics over a parsed browsertime.json; returns the
+    # float64 (iterations x metrics) block.
+    if not isinstance(data, list):
+        raise ValueError(_structure_error(None, type(data)))
+    rows = []
+    for entry in data:
+        if not isinstance(entry, dict):
+            raise ValueError(_structure_error('item', type(entry)))
+        iterations = entry.get(iterate_over, [])
+        if not isinstance(iterations, list):
+            raise ValueError(_structure_error(iterate_over, type(iterations)))
+        for i in range(len(iterations)):
+            rows.append([metric(entry, i) for _, metric in compiled_metrics])
+    return np.array(rows, dtype=np.float64).reshape(len(rows), len(compiled_metrics))
+
+
+def extract_file(file_path, metrics_to_parse, iterate_over, stream=False):
+    # Returns (values, bytes_read, parse_seconds) where values is a float64
+    # (iterations x metrics) block, NaN where a metric is missing.
+    # iterate_over names the per-iteration list that drives the loop
+    # ('geckoPerfStats' or 'browserScripts').
+    metric_specs = tuple(tuple(metric) for metric in metrics_to_parse)
+    compiled_metrics = _compiled_metrics(metric_specs)
+    start = time.perf_counter()
+    if stream:
+        # load_selected names the file in its errors
+        data = load_selected(file_path, _referenced_paths(metric_specs), iterate_over)
+    else:
+        try:
+            data = load_json(file_path)
+        except ValueError as e:
+            raise ValueError(f"{file_path}: {e}") from None
+    parse_seconds = time.perf_counter() - start
+    try:
+        values = extract_entries(data, compiled_metrics, iterate_over)
+    except ValueError as e:
+        raise ValueError(f"{file_path}: {e}") from None
+    return values, os.path.getsize(file_path), parse_seconds
+
+
+def _extract_file_task(task):
+    return extract_file(*task)
+
+
+def load_results(directory_path, metrics_to_parse, iterate_over, jobs=1, stream=False,
+                 use_cache=True, rebuild_cache=False, progress=False, profile=None):
+    # progress: draw a files/s and MB/s progress bar on stderr.
+    # profile: a profiling.Profile that receives the stage timings and the
+    # parse cost of every file.
+    if stream and ijson is None:
+        logger.warning("ijson is not installed; falling back to full JSON parsing")
+        stream = False
+    if profile is None:
+        profile = Profile()
+    metric_names = [name for name, _ in metrics_to_parse]
+    with profile.stage('walk'):
+        result_files = list(find_result_files(directory_path))
+        stats = [os.stat(file_path) for _, _, _, file_path in result_files]
+
+    cache = None
+    with profile.stage('cache lookup'):
+        if use_cache:
+            try:
+                cache = ExtractionCache(directory_path, metrics_to_parse, iterate_over, rebuild=rebuild_cache)
+            except sqlite3.Error as e:
+                logger.warning("Extraction cache disabled: %s", e)
+        cached_blocks = [cache.get(file_path, stat) if cache else None
+                         for (_, _, _, file_path), stat in zip(result_files, stats)]
+    tasks = [(file_path, metrics_to_parse, iterate_over, stream)
+             for (_, _, _, file_path), cached in zip(result_files, cached_blocks) if cached is None]
+
+    builder = LongFrameBuilder()
+    # iterations seen so far in each run directory, so several files in one
+    # directory continue the iteration count
+    next_iteration = {}
+    progress_bar = ProgressBar(len(result_files), sum(stat.st_size for stat in stats)) if progress else None
+
+    def add_blocks(results):
+        # executor.map yields in submission order, so the frame is identical to the serial path
+        for (website_name, variant, run, file_path), stat, values in zip(result_files, stats, cached_blocks):
+            if values is not None:
+                logger.debug("file: %s (cached)", file_path)
+            else:
+                with profile.stage('parse'):
+                    values, bytes_read, parse_seconds = next(results)
+                profile.record_file(file_path, bytes_read, parse_seconds)
+                logger.debug("file: %s (%.1f MB, parsed in %.0f ms)", file_path, bytes_read / 1e6, parse_seconds * 1000)
+                if cache:
+                    with profile.stage('cache write'):
+                        cache.put(file_path, stat, values)
+            with profile.stage('build'):
+                run_directory = os.path.dirname(file_path)
+                first_iteration = next_iteration.get(run_directory, 0)
+                next_iteration[run_directory] = first_iteration + values.shape[0]
+                builder.extend_block(website_name, variant, metric_names, values, first_iteration=first_iteration,
+                                     run=run, source=os.path.relpath(file_path, directory_path))
+            if progress_bar:
+                progress_bar.update(stat.st_size)
+
+    try:
+        if jobs > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                add_blocks(executor.map(_extract_file_task, tasks, chunksize=max(1, len(tasks) // (jobs * 4))))
+        else:
+            add_blocks(map(_extract_file_task, tasks))
+    finally:
+        if progress_bar:
+            progress_bar.close()
+        if cache:
+            with profile.stage('cache write'):
+                cache.close()
+    if cache:
+        logger.info("%d of %d files loaded from the extraction cache", len(result_files) - len(tasks), len(result_files))
+    with profile.stage('build'):
+        return builder.build()
@@ -0,0 +1,115 @@
+import ast
+import operator
+
+# Declarative metric definitions.
+# A metric is a name plus a spec such as
+#   "geckoPerfStats.trr_dns_start / geckoPerfStats.trr_service_channel_count"
+# The first segment of each path names a per-iteration list in a
+# browsertime.json entry (geckoPerfStats, browserScripts, ...), and is indexed
+# by the iteration; the rest are dict keys. Keys that are not valid Python
+# identifiers can be written as subscripts: browserScripts.timings['first-paint'].
+# Specs may combine paths and numbers with + - * /, so ratios such as
+# MeanTRRFirstSentToLastReceived are just "a / b".
+#
+# referenced_paths lets the loader parse only the keys the specs read.
+#
+# Specs are parsed once into closures that return a float or None. A value
+# that is missing (KeyError, IndexError), not a number (TypeError,
+# ValueError; strings are not coerced) or divides by zero is None.
+
+MISSING_VALUE_ERRORS = (KeyError, IndexError, TypeError, ValueError, ZeroDivisionError)
+
+_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+}
+
+
+def _path_segments(node):
+    segments = []
+    while not isinstance(node, ast.Name):
+        if isinstance(node, ast.Attribute):
+            segments.append(node.attr)
+            node = node.value
+        elif isinstance(node, ast.Subscript) and isinstance(node.slice, ast.Constant) and isinstance(node.slice.value, str):
+            segments.append(node.slice.value)
+            node = node.value
+        else:
+            raise ValueError(f"unsupported path element: {ast.unparse(node)}")
+    segments.append(node.id)
+    segments.reverse()
+    return segments
+
+
+def _compile_path(segments):
+    if len(segments) < 2:
+        raise ValueError(f"path needs a list name and at least one key: {'.'.join(segments)}")
+    top, keys = segments[0], segments[1:]
+
+    def accessor(entry, i):
+        value = entry[top][i]
+        for key in keys:
+            value = value[key]
+        return value
+    return accessor
+
+
+def _compile_node(node):
+    if isinstance(node, ast.BinOp) and type(node.op) in _OPERATORS:
+        op = _OPERATORS[type(node.op)]
+        left = _compile_node(node.left)
+        right = _compile_node(node.right)
+        return lambda entry, i: op(left(entry, i), right(entry, i))
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        operand = _compile_node(node.operand)
+        return lambda entry, i: -operand(entry, i)
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+        constant = node.value
+        return lambda entry, i: constant
+    if isinstance(node, (ast.Attribute, ast.Subscript, ast.Name)):
+        return _compile_path(_path_segments(node))
+    raise ValueError(f"unsupported expression: {ast.unparse(node)}")
+
+
+def _parse_spec(spec):
+    try:
+        return ast.parse(spec.strip(), mode='eval').body
+    except SyntaxError as e:
+        raise ValueError(f"invalid metric spec {spec!r}: {e.msg}") from None
+
+
+def compile_metric(spec):
+    evaluate = _compile_node(_parse_spec(spec))
+
+    def metric(entry, i):
+        try:
+            value = evaluate(entry, i)
+            if isinstance(value, str):
+                return None
+            return float(value)
+        except MISSING_VALUE_ERRORS:
+            return None
+    return metric
+
+
+def compile_metrics(metrics_to_parse):
+    # [[name, spec], ...] -> [(name, callable), ...]
+    return [(name, compile_metric(spec)) for name, spec in metrics_to_parse]
+
+
+def referenced_paths(metrics_to_parse):
+    # Set of path tuples (list_name, key, ...) that the metric specs read.
+    paths = set()
+    for _, spec in metrics_to_parse:
+        nodes = [_parse_spec(spec)]
+        while nodes:
+            node = nodes.pop()
+            if isinstance(node, ast.BinOp):
+                nodes.extend((node.left, node.right))
+            elif isinstance(node, ast.UnaryOp):
+                nodes.append(node.operand)
+            elif isinstance(node, (ast.Attribute, ast.Subscript, ast.Name)):
+                paths.add(tuple(_path_segments(node)))
+    return paths
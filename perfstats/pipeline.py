@@ -0,0 +1,48 @@
+import pandas as pd
+
+from .filtering import add_cold_signal
+from .ingest import load_results
+from .presets import load_metric_set
+from .profiling import Profile
+from .significance import add_significance
+from .stats import aggregate
+
+# The extract and stats stages as plain functions, so other tools can use
+# them without going through the command line (or importing matplotlib).
+
+
+def extract(directory_path, metric_set='asyncopen', jobs=1, stream=False, use_cache=True,
+            rebuild_cache=False, progress=False, profile=None, cold_when=None):
+    # metric_set: a preset name, a path to a JSON/YAML metric set, or a
+    # {'iterate_over': ..., 'metrics': [[name, spec], ...]} mapping.
+    # Returns the long-format (Website, Variant, Run, Iteration, Metric, Value,
+    # Source) DataFrame. cold_when also extracts the signal of that condition
+    # for filtering.filter_iterations.
+    if isinstance(metric_set, str):
+        metric_set = load_metric_set(metric_set)
+    if cold_when is not None:
+        metric_set = add_cold_signal(metric_set, cold_when)
+    return load_results(directory_path, metric_set['metrics'], metric_set['iterate_over'], jobs=jobs,
+                        stream=stream, use_cache=use_cache, rebuild_cache=rebuild_cache, progress=progress,
+                        profile=profile)
+
+
+def summarize(df, baseline=None, correction='none', bootstrap_samples=2000, paired=False, profile=None):
+    # Returns the stats table with deltas, p-values and bootstrap CIs; with
+    # paired=True the tests compare each iteration with the same baseline
+    # iteration (see significance.py). A table tagged with cold/warm phases
+    # (filtering.tag_phases) is summarized per phase, and the stats table
+    # gets a Phase column.
+    if 'Phase' in df.columns:
+        tables = []
+        for phase, phase_df in df.groupby('Phase', observed=True):
+            stats = summarize(phase_df.drop(columns='Phase'), baseline, correction, bootstrap_samples, paired, profile)
+            stats.insert(0, 'Phase', phase)
+            tables.append(stats)
+        return pd.concat(tables, ignore_index=True)
+    if profile is None:
+        profile = Profile()
+    with profile.stage('aggregate'):
+        stats = aggregate(df, baseline=baseline)
+    with profile.stage('significance'):
+        return add_significance(df, stats, num_resamples=bootstrap_samples, correction=correction, paired=paired)
@@ -0,0 +1,87 @@
+import json
+import os
+
+# Metric sets.
+# A metric set is the list of [name, spec] metrics to extract (see
+# metrics.py) plus the per-iteration list that drives the loop over
+# iterations. Built-in presets are selected by name; anything else is read
+# from a JSON or YAML file:
+#
+#   iterate_over: geckoPerfStats
+#   metrics:
+#     AsyncOpenToConnectEnd: geckoPerfStats.AsyncOpenToConnectEnd
+#     trr_dns_start: geckoPerfStats.trr_dns_start / geckoPerfStats.trr_service_channel_count
+#
+# `metrics` may also be a list of [name, spec] pairs.
+
+PRESETS = {
+    'asyncopen': {
+        'iterate_over': 'geckoPerfStats',
+        'metrics': [
+            ["AsyncOpenToConnectEnd", "geckoPerfStats.AsyncOpenToConnectEnd"],
+            ["AsyncOpenToFirstSent", "geckoPerfStats.AsyncOpenToFirstSent"],
+        ],
+    },
+    'dns': {
+        'iterate_over': 'geckoPerfStats',
+        'metrics': [
+            ["HttpSubItemDnsTime", "geckoPerfStats.HttpSubItemDnsTime"],
+            ["DNSLookupCacheHit", "geckoPerfStats.DNSLookupCacheHit"],
+            ["DNSLookupNetworkFirst", "geckoPerfStats.DNSLookupNetworkFirst"],
+            ["DNSLookupNetworkShared", "geckoPerfStats.DNSLookupNetworkShared"],
+        ],
+    },
+    'trr': {
+        'iterate_over': 'browserScripts',
+        'metrics': [
+            ["document_dns_lookup", "geckoPerfStats.document_dns_lookup"],
+            ["connectStart", "browserScripts.timings.navigationTiming.connectStart"],
+            ["trr_lookup_time", "geckoPerfStats.trr_lookup_time / geckoPerfStats.trr_service_channel_count"],
+            ["trr_service_channel_count", "geckoPerfStats.trr_service_channel_count"],
+            ["trr_dns_start", "geckoPerfStats.trr_dns_start / geckoPerfStats.trr_service_channel_count"],
+            ["trr_dns_end", "geckoPerfStats.trr_dns_end / geckoPerfStats.trr_service_channel_count"],
+            ["trr_tcp_connection", "geckoPerfStats.trr_tcp_connection / geckoPerfStats.trr_service_channel_count"],
+            ["trr_tls_handshake", "geckoPerfStats.trr_tls_handshake / geckoPerfStats.trr_service_channel_count"],
+            ["trr_open_to_first_sent", "geckoPerfStats.trr_open_to_first_sent / geckoPerfStats.trr_service_channel_count"],
+            ["trr_first_sent_to_last_received", "geckoPerfStats.trr_first_sent_to_last_received / geckoPerfStats.trr_service_channel_count"],
+            ["trr_open_to_first_received", "geckoPerfStats.trr_open_to_first_received / geckoPerfStats.trr_service_channel_count"],
+            ["trr_complete_load", "geckoPerfStats.trr_complete_load / geckoPerfStats.trr_service_channel_count"],
+        ],
+    },
+    'trr_requests': {
+        'iterate_over': 'geckoPerfStats',
+        'metrics': [
+            ["MeanTRRFirstSentToLastReceived", "geckoPerfStats.TRRFirstSentToLastReceived / geckoPerfStats.TRRRequestCount"],
+        ],
+    },
+}
+
+
+def _normalize(metric_set, source):
+    if not isinstance(metric_set, dict) or 'metrics' not in metric_set:
+        raise ValueError(f"{source}: expected a mapping with a 'metrics' entry")
+    metrics = metric_set['metrics']
+    if isinstance(metrics, dict):
+        metrics = [[name, spec] for name, spec in metrics.items()]
+    metrics = [[str(name), str(spec)] for name, spec in metrics]
+    if not metrics:
+        raise ValueError(f"{source}: no metrics defined")
+    return {'iterate_over': metric_set.get('iterate_over', 'geckoPerfStats'), 'metrics': metrics}
+
+
+def load_metric_set(name_or_path):
+    # Returns {'iterate_over': ..., 'metrics': [[name, spec], ...]}
+    if name_or_path in PRESETS:
+        return _normalize(PRESETS[name_or_path], name_or_path)
+    if not os.path.exists(name_or_path):
+        raise ValueError(f"unknown metric set {name_or_path!r}: not a preset ({', '.join(PRESETS)}) or a file")
+    with open(name_or_path, 'r') as file:
+        if name_or_path.endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError("PyYAML is required to read YAML metric sets") from None
+            metric_set = yaml.safe_load(file)
+        else:
+            metric_set = json.load(file)
+    return _normalize(metric_set, name_or_path)
@@ -0,0 +1,128 @@
+import contextlib
+import cProfile
+import logging
+import sys
+import time
+import tracemalloc
+
+logger = logging.getLogger(__name__)
+
+# Instrumentation shared by the pipeline stages.
+#
+# Profile accumulates the wall time of named stages (and, while tracemalloc
+# is tracing, each stage's peak traced memory) plus the parse cost of every
+# browsertime.json, and logs them as a report (perfstats --profile).
+#
+# session() wraps a whole command: it logs that report at the end and
+# optionally dumps a cProfile of the main process and the top tracemalloc
+# allocation sites.
+#
+# ProgressBar draws a single files/s and MB/s progress line on stderr while
+# the tree is being loaded.
+
+
+class Profile:
+    def __init__(self):
+        self.seconds = {}
+        self.peak_bytes = {}
+        # (file_path, bytes, parse_seconds) for every file that was parsed
+        self.files = []
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] = self.seconds.get(name, 0.0) + time.perf_counter() - start
+            if tracemalloc.is_tracing():
+                self.peak_bytes[name] = max(self.peak_bytes.get(name, 0), tracemalloc.get_traced_memory()[1])
+
+    def record_file(self, file_path, num_bytes, parse_seconds):
+        self.files.append((file_path, num_bytes, parse_seconds))
+
+    def log_report(self, slowest=10):
+        total = sum(self.seconds.values())
+        lines = ["Profile:", f"  {'stage':<16} {'seconds':>10} {'share':>7}" + (f" {'peak MB':>10}" if self.peak_bytes else '')]
+        for name, seconds in self.seconds.items():
+            line = f"  {name:<16} {seconds:10.3f} {seconds / total * 100 if total else 0:6.1f}%"
+            if self.peak_bytes:
+                line += f" {self.peak_bytes.get(name, 0) / 1e6:10.1f}"
+            lines.append(line)
+        lines.append(f"  {'total':<16} {total:10.3f}")
+        if self.files:
+            num_bytes = sum(size for _, size, _ in self.files)
+            parse_seconds = sum(seconds for _, _, seconds in self.files)
+            lines.append(f"Parsed {len(self.files)} files, {num_bytes / 1e6:.1f} MB in {parse_seconds:.3f} s of parse time "
+                         f"({num_bytes / 1e6 / parse_seconds if parse_seconds else 0:.1f} MB/s, "
+                         f"{parse_seconds / len(self.files) * 1000:.1f} ms per file)")
+            lines.append("Slowest files:")
+            for file_path, size, seconds in sorted(self.files, key=lambda file: file[2], reverse=True)[:slowest]:
+                lines.append(f"  {seconds * 1000:9.1f} ms {size / 1e6:8.1f} MB  {file_path}")
+        logger.info('\n'.join(lines))
+
+
+@contextlib.contextmanager
+def session(profile, cprofile_path=None, memory=False, slowest=10):
+    if memory:
+        tracemalloc.start()
+    profiler = cProfile.Profile() if cprofile_path else None
+    if profiler:
+        profiler.enable()
+    try:
+        yield profile
+    finally:
+        if profiler:
+            profiler.disable()
+        if memory:
+            snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, cProfile.__file__),
+                                                                  tracemalloc.Filter(False, tracemalloc.__file__)])
+            # stages reset the traced peak, so the overall peak is the largest stage peak
+            peak = max([tracemalloc.get_traced_memory()[1]] + list(profile.peak_bytes.values()))
+            tracemalloc.stop()
+        profile.log_report(slowest)
+        if profiler:
+            profiler.dump_stats(cprofile_path)
+            logger.info("cProfile stats written to %s (python -m pstats %s); worker processes are not included",
+                        cprofile_path, cprofile_path)
+        if memory:
+            lines = [f"Peak traced memory: {peak / 1e6:.1f} MB", "Largest allocations still live at exit:"]
+            for statistic in snapshot.statistics('lineno')[:slowest]:
+                lines.append(f"  {statistic.size / 1e6:8.2f} MB {statistic.count:8d} blocks  {statistic.traceback[0]}")
+            logger.info('\n'.join(lines))
+
+
+class ProgressBar:
+    def __init__(self, total_files, total_bytes, stream=None, width=30, interval=0.1):
+        self.total_files = total_files
+        self.total_bytes = total_bytes
+        self.stream = stream or sys.stderr
+        self.width = width
+        self.interval = interval
+        self.files = 0
+        self.bytes = 0
+        self.start = self.last_draw = time.perf_counter()
+
+    def update(self, num_bytes):
+        self.files += 1
+        self.bytes += num_bytes
+        now = time.perf_counter()
+        if now - self.last_draw >= self.interval or self.files == self.total_files:
+            self.last_draw = now
+            self._draw(now)
+
+    def _draw(self, now):
+        elapsed = max(now - self.start, 1e-9)
+        filled = self.width * self.files // max(self.total_files, 1)
+        remaining = (self.total_bytes - self.bytes) / self.bytes * elapsed if self.bytes else 0
+        self.stream.write(f"\r[{'#' * filled}{' ' * (self.width - filled)}] {self.files}/{self.total_files} files "
+                          f"{self.files / elapsed:7.1f} files/s {self.bytes / 1e6 / elapsed:7.1f} MB/s "
+                          f"ETA {remaining:5.0f} s")
+        self.stream.flush()
+
+    def close(self):
+        if self.files:
+            self.stream.write('\n')
+            self.stream.flush()
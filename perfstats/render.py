@@ -0,0 +1,174 @@
+import logging
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+import matplotlib.pyplot as plt
+import numpy as np
+
+from .stats import OVERALL, site_stats
+
+logger = logging.getLogger(__name__)
+
+# Figure rendering for the per-website and overall metric grids.
+# Interactive mode draws one figure at a time and blocks in plt.show().
+# Headless mode (render_figures(..., headless=True)) switches to the Agg
+# backend, never calls show(), and renders the per-website figures in a
+# process pool. Each worker keeps one figure per grid shape and clears it
+# between websites instead of allocating a new one, and all figures are
+# closed when rendering is done so memory stays flat over large sweeps.
+
+# (rows, cols) -> (fig, axs), reused by headless workers
+_figures = {}
+
+
+def grid_shape(num_metrics):
+    cols = math.ceil(math.sqrt(num_metrics))
+    rows = math.ceil(num_metrics / cols)
+    return rows, cols
+
+
+def plot_metric(ax, metric, metric_df, metric_stats, plot_type):
+    # metric_stats: the stats table rows for this metric, one per variant
+    variant_groups = metric_df.groupby('Variant', observed=True)
+    medians = metric_stats.set_index('Variant')['median']
+    ax.set_title(metric, fontsize=12)
+    ax.set_xlabel('Variant', fontsize=10)
+    ax.set_ylabel('Value (ms)', fontsize=10)
+
+    if plot_type == 'scatter':
+        for variant, data in variant_groups:
+            ax.scatter([variant] * len(data), data['Value'], label=variant)
+        ax.tick_params(axis='x', rotation=45, labelsize=8)
+    elif plot_type == 'violin':
+        groups = list(variant_groups)
+        violin_data = []
+        for (_, group_df) in groups:
+            # Convert group values to a list then to a numpy array
+            values = group_df['Value'].dropna().tolist()
+            if not values:
+                values = [np.nan]
+            violin_data.append(np.array(values))
+        labels = [variant for (variant, _) in groups]
+        ax.violinplot(violin_data, showmeans=False, showmedians=False, showextrema=False)
+        ax.set_xticks(range(1, len(labels)+1))
+        ax.set_xticklabels(labels, rotation=45, fontsize=8)
+        for j, variant in enumerate(labels):
+            median_val = medians.get(variant, np.nan)
+            if not np.isnan(median_val):
+                ax.text(j+1, median_val, f"Median: {median_val:.2f}\n",
+                        ha='center', va='bottom', color='red', fontsize=8)
+    else:  # fallback to box plot
+        box_data = [group[1]['Value'].dropna() for group in variant_groups]
+        labels = [group[0] for group in variant_groups]
+        if box_data:
+            ax.boxplot(box_data, labels=labels)
+            ax.tick_params(axis='x', rotation=45, labelsize=8)
+            for x, variant in enumerate(labels, start=1):
+                median_val = medians.get(variant, np.nan)
+                if not np.isnan(median_val):
+                    ax.text(x, median_val + 0.1, f"{median_val:.2f}",
+                            ha='center', va='bottom', color='red', fontsize=8)
+        else:
+            logger.warning("No data available to plot for metric '%s'.", metric)
+
+
+def _new_figure(rows, cols):
+    fig, axs = plt.subplots(rows, cols, figsize=(cols * 5, rows * 5))
+    return fig, list(np.atleast_1d(axs).flatten())
+
+
+def _reused_figure(rows, cols):
+    if (rows, cols) not in _figures:
+        _figures[(rows, cols)] = _new_figure(rows, cols)
+    fig, axs = _figures[(rows, cols)]
+    for ax in axs:
+        ax.clear()
+        ax.set_visible(True)
+    return fig, axs
+
+
+def draw_figure(fig, axs, title, df, stats, metric_names, plot_type):
+    # df/stats: the long-format rows and stats table rows for one website (or overall)
+    fig.suptitle(title, fontsize=16)
+    metric_groups = dict(list(df.groupby('Metric', observed=True)))
+    for ax, metric in zip(axs, metric_names):
+        metric_df = metric_groups.get(metric, df.iloc[0:0])
+        plot_metric(ax, metric, metric_df, stats[stats['Metric'] == metric], plot_type)
+    for ax in axs[len(metric_names):]:
+        ax.set_visible(False)
+    fig.tight_layout(rect=[0, 0, 1, 0.95])
+
+
+def figure_path(output_dir, name, plot_type, fmt):
+    safe_name = name.replace('/', '_').replace('\\', '_')
+    return os.path.join(output_dir, f"{safe_name}_{plot_type}.{fmt}")
+
+
+def _render_website(task):
+    website, website_df, website_stats, plot_type, output_dir, fmt, dpi = task
+    metric_names = list(website_df['Metric'].unique())
+    fig, axs = _reused_figure(*grid_shape(len(metric_names)))
+    draw_figure(fig, axs, f"Website: {website}", website_df, website_stats, metric_names, plot_type)
+    filename = figure_path(output_dir, website, plot_type, fmt)
+    fig.savefig(filename, dpi=dpi, bbox_inches='tight')
+    return filename
+
+
+def _init_headless_worker():
+    matplotlib.use('Agg')
+
+
+def _close_reused_figures():
+    for fig, _ in _figures.values():
+        plt.close(fig)
+    _figures.clear()
+
+
+def render_figures(df, stats, metric_names, plot_type, output_dir=None, fmt='png', dpi=300,
+                   headless=False, jobs=1):
+    # Renders one figure per website plus the overall figure.
+    # Figures are saved to output_dir when it is given (always in headless
+    # mode) and shown interactively otherwise.
+    if not metric_names or df.empty:
+        logger.warning("No results to plot")
+        return
+    if output_dir is not None and not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    website_groups = list(df.groupby('Website', observed=True))
+    if headless:
+        plt.switch_backend('Agg')
+        tasks = [(website, website_df, site_stats(stats, website), plot_type, output_dir, fmt, dpi)
+                 for website, website_df in website_groups]
+        if jobs > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=jobs, initializer=_init_headless_worker) as executor:
+                for filename in executor.map(_render_website, tasks):
+                    logger.info("Saved plot to %s", filename)
+                # workers exit with the pool, which frees their figures
+        else:
+            for task in tasks:
+                logger.info("Saved plot to %s", _render_website(task))
+            _close_reused_figures()
+    else:
+        for website, website_df in website_groups:
+            website_metrics = list(website_df['Metric'].unique())
+            fig, axs = _new_figure(*grid_shape(len(website_metrics)))
+            draw_figure(fig, axs, f"Website: {website}", website_df, site_stats(stats, website), website_metrics, plot_type)
+            if output_dir is not None:
+                filename = figure_path(output_dir, website, plot_type, fmt)
+                fig.savefig(filename, dpi=dpi, bbox_inches='tight')
+                logger.info("Saved plot to %s", filename)
+            plt.show()
+            plt.close(fig)
+
+    overall_fig, overall_axs = _new_figure(*grid_shape(len(metric_names)))
+    draw_figure(overall_fig, overall_axs, "Overall Metrics", df, site_stats(stats, OVERALL), metric_names, plot_type)
+    if output_dir is not None:
+        overall_filename = figure_path(output_dir, 'overall_metrics', plot_type, fmt)
+        overall_fig.savefig(overall_filename, dpi=dpi, bbox_inches='tight')
+        logger.info("Saved overall plot to %s", overall_filename)
+    if not headless:
+        plt.show()
+    plt.close(overall_fig)
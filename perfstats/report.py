@@ -0,0 +1,273 @@
+import datetime
+import html
+import json
+import math
+
+import numpy as np
+
+from .stats import OVERALL
+
+# Self-contained HTML report.
+# Instead of embedding raw samples, every (Website, Metric, Variant)
+# distribution is reduced to a fixed set of quantiles and a histogram, and
+# joined with its row of the stats table (the same table print_stats
+# prints). The report size therefore depends on the number of distributions
+# and not on the number of samples.
+#
+# The variants of one website and metric share histogram bins spanning the
+# 0.5th to 99.5th percentile of their pooled values; values outside that
+# range are counted in the first or last bin. The page draws the
+# histograms and quantile boxes as inline SVG from the embedded JSON with a
+# site/metric/variant (and phase) selector, and loads nothing external.
+
+QUANTILES = (0.0, 0.05, 0.25, 0.5, 0.75, 0.95, 1.0)
+STAT_FIELDS = ('mean', 'median', 'std', 'count', 'baseline', 'mean_delta_pct', 'median_delta_pct',
+               'p_value', 'p_adjusted', 'median_delta_ci_low', 'median_delta_ci_high',
+               'pairs', 'paired_median_delta')
+
+
+def _round(value, digits=4):
+    # significant digits keep the embedded JSON small; NaN becomes null
+    if value is None or isinstance(value, str):
+        return value
+    value = float(value)
+    if not math.isfinite(value):
+        return None
+    return float(f"{value:.{digits}g}")
+
+
+def _distributions(df, cell_keys, bins):
+    # Yields (cell key tuple, low, high, variant, counts, quantiles) for every
+    # variant of every cell, where a cell is one histogram axis.
+    df = df[df['Value'].notna()]
+    values = df['Value'].to_numpy()
+    cells = df.groupby(cell_keys, observed=True)
+    cell_codes = cells.ngroup().to_numpy()
+    low = cells['Value'].quantile(0.005).to_numpy()
+    high = cells['Value'].quantile(0.995).to_numpy()
+    width = np.where(high > low, high - low, 1.0)
+    positions = np.clip(((values - low[cell_codes]) / width[cell_codes] * bins).astype(np.int64), 0, bins - 1)
+
+    series = df.groupby(cell_keys + ['Variant'], observed=True)
+    series_codes = series.ngroup().to_numpy()
+    counts = np.bincount(series_codes * bins + positions, minlength=series.ngroups * bins).reshape(series.ngroups, bins)
+    series_cells = np.empty(series.ngroups, dtype=np.int64)
+    series_cells[series_codes] = cell_codes
+    quantiles = series['Value'].quantile(list(QUANTILES)).unstack()
+    for code, (key, row) in enumerate(quantiles.iterrows()):
+        cell = series_cells[code]
+        yield key[:-1], low[cell], high[cell], key[-1], counts[code], row.to_numpy()
+
+
+def report_data(df, stats, bins=40, title="perfstats report"):
+    has_phases = 'Phase' in df.columns
+    phase_keys = ['Phase'] if has_phases else []
+    stat_rows = {}
+    for row in stats.to_dict('records'):
+        key = (str(row['Phase']) if has_phases else '', str(row['Website']), str(row['Metric']), str(row['Variant']))
+        stat_rows[key] = {field: _round(row[field]) for field in STAT_FIELDS if field in row}
+
+    cells = {}
+    for keys, website_keys in ((phase_keys + ['Website', 'Metric'], True), (phase_keys + ['Metric'], False)):
+        for cell_key, low, high, variant, counts, quantiles in _distributions(df, keys, bins):
+            cell_key = tuple(str(value) for value in cell_key)
+            phase = cell_key[0] if has_phases else ''
+            website = cell_key[-2] if website_keys else OVERALL
+            metric = cell_key[-1]
+            cell = cells.setdefault((phase, website, metric), {
+                'phase': phase, 'website': website, 'metric': metric,
+                'low': _round(low, 6), 'high': _round(high, 6), 'series': [],
+            })
+            cell['series'].append({
+                'variant': str(variant),
+                'counts': counts.tolist(),
+                'quantiles': [_round(value) for value in quantiles],
+                'stats': stat_rows.get((phase, website, metric, str(variant)), {}),
+            })
+
+    websites = sorted({website for _, website, _ in cells if website != OVERALL})
+    return {
+        'title': title,
+        'generated': datetime.datetime.now().replace(microsecond=0).isoformat(),
+        'bins': bins,
+        'quantiles': list(QUANTILES),
+        'phases': [str(phase) for phase in df['Phase'].cat.categories] if has_phases else [''],
+        'websites': [OVERALL] + websites,
+        'metrics': [str(metric) for metric in df['Metric'].cat.categories],
+        'variants': [str(variant) for variant in df['Variant'].cat.categories],
+        'cells': list(cells.values()),
+    }
+
+
+def write_report(df, stats, path, bins=40, title="perfstats report"):
+    data = report_data(df, stats, bins=bins, title=title)
+    # '</' is escaped so the JSON cannot close the script element
+    payload = json.dumps(data, separators=(',', ':'), allow_nan=False).replace('</', '<\\/')
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(_TEMPLATE.replace('__TITLE__', html.escape(title)).replace('__DATA__', payload))
+    return path
+
+
+_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>__TITLE__</title>
+<style>
+body { font: 14px/1.4 system-ui, sans-serif; margin: 1.5em; color: #222; }
+h1 { font-size: 1.4em; margin: 0 0 .2em; }
+.controls { display: flex; flex-wrap: wrap; gap: 1em; align-items: center; margin: 1em 0; }
+.controls label { font-weight: 600; }
+.variants label { font-weight: normal; margin-right: .8em; }
+.swatch { display: inline-block; width: .8em; height: .8em; margin-right: .3em; vertical-align: middle; }
+svg { display: block; margin: .5em 0; }
+table { border-collapse: collapse; margin-top: 1em; }
+th, td { padding: .25em .7em; text-align: right; border-bottom: 1px solid #ddd; }
+th:first-child, td:first-child { text-align: left; }
+.note { color: #777; font-size: .9em; }
+.better { color: #1a7f37; } .worse { color: #cf222e; }
+</style>
+</head>
+<body>
+<h1>__TITLE__</h1>
+<div class="note" id="generated"></div>
+<div class="controls">
+  <span id="phase-control"><label for="phase">Phase</label> <select id="phase"></select></span>
+  <span><label for="website">Website</label> <select id="website"></select></span>
+  <span><label for="metric">Metric</label> <select id="metric"></select></span>
+  <span class="variants" id="variants"></span>
+</div>
+<div id="chart"></div>
+<div id="table"></div>
+<script id="report-data" type="application/json">__DATA__</script>
+<script>
+(function () {
+  var data = JSON.parse(document.getElementById('report-data').textContent);
+  var colors = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf'];
+  var cells = {};
+  data.cells.forEach(function (cell) { cells[[cell.phase, cell.website, cell.metric].join('\\u0000')] = cell; });
+  var shown = {};
+  data.variants.forEach(function (variant) { shown[variant] = true; });
+
+  function color(variant) { return colors[data.variants.indexOf(variant) % colors.length]; }
+  function fmt(value, digits) { return value === null || value === undefined ? '' : Number(value).toFixed(digits); }
+  function fill(select, values) {
+    values.forEach(function (value) {
+      var option = document.createElement('option');
+      option.value = option.textContent = value;
+      select.appendChild(option);
+    });
+    select.onchange = draw;
+  }
+  function svg(tag, attributes, parent) {
+    var element = document.createElementNS('http://www.w3.org/2000/svg', tag);
+    for (var name in attributes) element.setAttribute(name, attributes[name]);
+    if (parent) parent.appendChild(element);
+    return element;
+  }
+
+  document.getElementById('generated').textContent = 'Generated ' + data.generated;
+  fill(document.getElementById('phase'), data.phases);
+  if (data.phases.length === 1 && data.phases[0] === '') document.getElementById('phase-control').style.display = 'none';
+  fill(document.getElementById('website'), data.websites);
+  fill(document.getElementById('metric'), data.metrics);
+  var variantControls = document.getElementById('variants');
+  data.variants.forEach(function (variant) {
+    var label = document.createElement('label');
+    var box = document.createElement('input');
+    box.type = 'checkbox';
+    box.checked = true;
+    box.onchange = function () { shown[variant] = box.checked; draw(); };
+    var swatch = document.createElement('span');
+    swatch.className = 'swatch';
+    swatch.style.background = color(variant);
+    label.appendChild(box);
+    label.appendChild(swatch);
+    label.appendChild(document.createTextNode(variant));
+    variantControls.appendChild(label);
+  });
+
+  function draw() {
+    var key = ['phase', 'website', 'metric'].map(function (id) { return document.getElementById(id).value; });
+    var cell = cells[key.join('\\u0000')];
+    var chart = document.getElementById('chart');
+    var table = document.getElementById('table');
+    chart.innerHTML = table.innerHTML = '';
+    if (!cell) { chart.textContent = 'No data for this selection.'; return; }
+    var series = cell.series.filter(function (s) { return shown[s.variant]; });
+    var width = 760, left = 60, right = 20, histHeight = 220, boxHeight = 22;
+    var height = histHeight + 40 + series.length * boxHeight + 30;
+    var low = cell.low, high = cell.high > cell.low ? cell.high : cell.low + 1;
+    series.forEach(function (s) { low = Math.min(low, s.quantiles[0]); high = Math.max(high, s.quantiles[6]); });
+    var x = function (value) { return left + (value - low) / (high - low) * (width - left - right); };
+    var root = svg('svg', {width: width, height: height, 'font-size': 11}, chart);
+
+    // histograms as densities, so variants with different counts compare
+    var binWidth = (cell.high > cell.low ? cell.high - cell.low : 1) / data.bins;
+    var densities = series.map(function (s) {
+      var total = s.counts.reduce(function (a, b) { return a + b; }, 0) || 1;
+      return s.counts.map(function (count) { return count / total; });
+    });
+    var peak = Math.max.apply(null, [1e-12].concat.apply([], densities));
+    series.forEach(function (s, i) {
+      var points = [];
+      densities[i].forEach(function (density, bin) {
+        var x0 = x(cell.low + bin * binWidth), x1 = x(cell.low + (bin + 1) * binWidth);
+        var y = histHeight - density / peak * (histHeight - 10);
+        points.push(x0 + ',' + y, x1 + ',' + y);
+      });
+      points.unshift(x(cell.low) + ',' + histHeight);
+      points.push(x(cell.low + data.bins * binWidth) + ',' + histHeight);
+      svg('polyline', {points: points.join(' '), fill: color(s.variant), 'fill-opacity': 0.15,
+                       stroke: color(s.variant), 'stroke-width': 1.5}, root);
+    });
+    svg('line', {x1: left, x2: width - right, y1: histHeight, y2: histHeight, stroke: '#999'}, root);
+
+    // quantile boxes: whiskers from p5 to p95, box from p25 to p75, median tick
+    series.forEach(function (s, i) {
+      var q = s.quantiles, y = histHeight + 40 + i * boxHeight, c = color(s.variant);
+      svg('line', {x1: x(q[1]), x2: x(q[5]), y1: y, y2: y, stroke: c}, root);
+      svg('rect', {x: x(q[2]), y: y - 7, width: Math.max(x(q[4]) - x(q[2]), 1), height: 14,
+                   fill: c, 'fill-opacity': 0.3, stroke: c}, root);
+      svg('line', {x1: x(q[3]), x2: x(q[3]), y1: y - 8, y2: y + 8, stroke: c, 'stroke-width': 2.5}, root);
+      svg('circle', {cx: x(q[0]), cy: y, r: 2, fill: c}, root);
+      svg('circle', {cx: x(q[6]), cy: y, r: 2, fill: c}, root);
+      svg('text', {x: 4, y: y + 4}, root).textContent = s.variant.slice(0, 9);
+    });
+
+    var axisY = height - 12;
+    for (var t = 0; t <= 5; t++) {
+      var value = low + (high - low) * t / 5;
+      svg('text', {x: x(value), y: axisY, 'text-anchor': 'middle'}, root).textContent = Number(value.toPrecision(4));
+    }
+
+    var header = ['Variant', 'Count', 'Mean', 'Median', 'Std', 'p5', 'p95', 'Mean \\u0394', 'Median \\u0394', 'p-value', 'Median \\u0394 CI'];
+    var rows = series.map(function (s) {
+      var st = s.stats, delta = st.median_delta_pct;
+      var ci = st.median_delta_ci_low === null || st.median_delta_ci_low === undefined ? '' :
+        '[' + fmt(st.median_delta_ci_low, 2) + '%, ' + fmt(st.median_delta_ci_high, 2) + '%]';
+      var p = st.p_value === null || st.p_value === undefined ? '' :
+        fmt(st.p_value, 4) + (st.p_adjusted !== st.p_value && st.p_adjusted !== null ? ' (adj. ' + fmt(st.p_adjusted, 4) + ')' : '');
+      return [s.variant, st.count, fmt(st.mean, 3), fmt(st.median, 3), fmt(st.std, 3), fmt(s.quantiles[1], 3),
+              fmt(s.quantiles[5], 3), s.variant === st.baseline ? '' : fmt(st.mean_delta_pct, 2) + '%',
+              {text: s.variant === st.baseline ? 'baseline' : fmt(delta, 2) + '%',
+               className: delta > 0 ? 'worse' : delta < 0 ? 'better' : ''}, p, ci];
+    });
+    var element = document.createElement('table');
+    [header].concat(rows).forEach(function (cells, index) {
+      var tr = element.insertRow();
+      cells.forEach(function (value) {
+        var td = document.createElement(index === 0 ? 'th' : 'td');
+        if (value !== null && typeof value === 'object') { td.textContent = value.text; td.className = value.className; }
+        else td.textContent = value === undefined || value === null ? '' : value;
+        tr.appendChild(td);
+      });
+    });
+    table.appendChild(element);
+  }
+  draw();
+})();
+</script>
+</body>
+</html>
+"""
@@ -0,0 +1,293 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from .stats import OVERALL
+
+# Significance of each variant-vs-baseline cell in the stats table.
+# add_significance() adds, for every (Website, Metric, Variant) row that is
+# not the baseline:
+#   p_value            two-sided Mann-Whitney U (normal approximation with
+#                      tie and continuity correction)
+#   p_adjusted         p_value after the multiple-comparison correction
+#   median_delta_ci_low / median_delta_ci_high
+#                      bootstrap percentile CI of the median delta, in percent
+# With paired=True each variant iteration is instead paired with the
+# baseline iteration of the same page load (Website, Run, Iteration), and:
+#   pairs              number of paired iterations
+#   paired_median_delta
+#                      median per-iteration difference (variant - baseline)
+#   p_value            two-sided Wilcoxon signed-rank test of the differences
+#                      (normal approximation with tie correction, zero
+#                      differences dropped)
+#   median_delta_ci_low / median_delta_ci_high
+#                      bootstrap CI of the median per-iteration difference, in
+#                      percent of the baseline median
+# Both the tests and the bootstrap are computed for many cells at once on
+# NaN-padded (cells x samples) arrays. Cells are processed in chunks of
+# similar sample size so padding stays small. Bootstrap medians are sampled
+# from their exact order-statistic distribution (see _bootstrap_medians), so
+# the cost per cell is O(resamples) rather than O(resamples x samples).
+
+CORRECTIONS = ('none', 'bonferroni', 'holm', 'fdr_bh')
+
+# upper bound on elements in the padded arrays of one chunk of cells
+_MAX_CHUNK_ELEMENTS = 20_000_000
+
+_erfc = np.vectorize(math.erfc, otypes=[np.float64])
+
+
+def _padded(samples, width):
+    out = np.full((len(samples), width), np.nan)
+    for row, values in enumerate(samples):
+        out[row, :len(values)] = values
+    return out
+
+
+def _average_ranks(values):
+    # Per-row average ranks (1-based) of a NaN-padded 2-D array, plus the
+    # per-row tie term sum(t^3 - t). NaNs sort last and are ignored.
+    num_rows, width = values.shape
+    order = np.argsort(values, axis=1, kind='stable')
+    ordered = np.take_along_axis(values, order, axis=1)
+    positions = np.broadcast_to(np.arange(width), (num_rows, width))
+    starts = np.ones((num_rows, width), dtype=bool)
+    starts[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+    ends = np.ones((num_rows, width), dtype=bool)
+    ends[:, :-1] = starts[:, 1:]
+    first = np.maximum.accumulate(np.where(starts, positions, 0), axis=1)
+    last = np.minimum.accumulate(np.where(ends, positions, width - 1)[:, ::-1], axis=1)[:, ::-1]
+    valid = ~np.isnan(ordered)
+    tie_sizes = (last - first + 1).astype(np.float64)
+    # each tied group of size t contributes t * (t^2 - 1) = sum over its members of (t^2 - 1)
+    ties = np.where(valid, tie_sizes ** 2 - 1, 0).sum(axis=1)
+    ranks = np.empty_like(values)
+    np.put_along_axis(ranks, order, (first + last) / 2 + 1, axis=1)
+    return ranks, ties
+
+
+def mann_whitney_u(x, x_counts, y, y_counts):
+    # x, y: NaN-padded (cells x samples) arrays; returns two-sided p-values
+    combined = np.concatenate([x, y], axis=1)
+    ranks, ties = _average_ranks(combined)
+    rank_sum_x = np.where(np.isnan(x), 0, ranks[:, :x.shape[1]]).sum(axis=1)
+    nx = x_counts.astype(np.float64)
+    ny = y_counts.astype(np.float64)
+    n = nx + ny
+    u = rank_sum_x - nx * (nx + 1) / 2
+    mean_u = nx * ny / 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variance = nx * ny / 12 * ((n + 1) - ties / (n * (n - 1)))
+        z = (np.abs(u - mean_u) - 0.5) / np.sqrt(variance)
+    p = _erfc(np.maximum(z, 0) / math.sqrt(2))
+    p[(x_counts == 0) | (y_counts == 0) | ~(variance > 0)] = np.nan
+    return np.minimum(p, 1.0)
+
+
+def wilcoxon_signed_rank(differences, counts):
+    # differences: NaN-padded (cells x pairs) array; returns two-sided p-values
+    nonzero = np.where(differences == 0, np.nan, differences)
+    ranks, ties = _average_ranks(np.abs(nonzero))
+    rank_sum_positive = np.where(nonzero > 0, ranks, 0).sum(axis=1)
+    n = (~np.isnan(nonzero)).sum(axis=1).astype(np.float64)
+    mean = n * (n + 1) / 4
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variance = n * (n + 1) * (2 * n + 1) / 24 - ties / 48
+        z = np.abs(rank_sum_positive - mean) / np.sqrt(variance)
+    p = _erfc(np.where(np.isnan(z), 0, z) / math.sqrt(2))
+    p[(counts == 0) | ~(variance > 0)] = np.nan
+    return np.minimum(p, 1.0)
+
+
+def _bootstrap_medians(rng, values, counts, num_resamples):
+    # Medians of `num_resamples` bootstrap resamples of each row, drawn without
+    # materializing the resamples. A resample of n draws from the sorted sample
+    # s[0..n-1] has order statistics s[ceil(U(k) * n) - 1], where U(k) is the
+    # k-th order statistic of n uniforms, i.e. Beta(k, n - k + 1). For even n
+    # the next order statistic is U(k) + (1 - U(k)) * Beta(1, n - k).
+    ordered = np.sort(values, axis=1)
+    n = np.maximum(counts, 1)
+    k = (n + 1) // 2
+    size = (len(values), num_resamples)
+    lower = rng.beta(k[:, None], (n - k + 1)[:, None], size=size)
+    upper = lower + (1 - lower) * rng.beta(1, np.maximum(n - k, 1)[:, None], size=size)
+    upper = np.where((n % 2 == 0)[:, None], upper, lower)
+
+    def order_statistic(u):
+        index = np.clip(np.ceil(u * n[:, None]).astype(np.intp) - 1, 0, (n - 1)[:, None])
+        return np.take_along_axis(ordered, index, axis=1)
+    return (order_statistic(lower) + order_statistic(upper)) / 2
+
+
+def _percentile_interval(resamples, confidence):
+    # Percentile interval of each row's finite resamples; NaN for rows
+    # without any (nanpercentile warns on all-NaN rows).
+    finite = np.isfinite(resamples)
+    rows = finite.any(axis=1)
+    low = np.full(len(resamples), np.nan)
+    high = np.full(len(resamples), np.nan)
+    if rows.any():
+        tail = (1 - confidence) / 2 * 100
+        low[rows], high[rows] = np.nanpercentile(np.where(finite[rows], resamples[rows], np.nan),
+                                                 [tail, 100 - tail], axis=1)
+    return low, high
+
+
+def bootstrap_median_delta_ci(rng, x, x_counts, y, y_counts, num_resamples, confidence):
+    # Percentile CI of (median(y*) - median(x*)) / median(x*) * 100
+    x_medians = _bootstrap_medians(rng, x, x_counts, num_resamples)
+    y_medians = _bootstrap_medians(rng, y, y_counts, num_resamples)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percent = np.where(x_medians != 0, (y_medians - x_medians) / x_medians * 100, np.nan)
+    low, high = _percentile_interval(percent, confidence)
+    empty = (x_counts == 0) | (y_counts == 0)
+    low[empty] = np.nan
+    high[empty] = np.nan
+    return low, high
+
+
+def bootstrap_paired_delta_ci(rng, differences, counts, baseline_medians, num_resamples, confidence):
+    # Percentile CI of median(d*) / baseline median * 100
+    medians = _bootstrap_medians(rng, differences, counts, num_resamples)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percent = medians / np.where(baseline_medians != 0, baseline_medians, np.nan)[:, None] * 100
+    low, high = _percentile_interval(percent, confidence)
+    low[counts == 0] = np.nan
+    high[counts == 0] = np.nan
+    return low, high
+
+
+def adjust_p_values(p_values, method):
+    p = np.asarray(p_values, dtype=np.float64)
+    adjusted = np.full_like(p, np.nan)
+    tested = ~np.isnan(p)
+    m = tested.sum()
+    if method == 'none' or m == 0:
+        return p.copy()
+    values = p[tested]
+    if method == 'bonferroni':
+        result = values * m
+    elif method == 'holm':
+        order = np.argsort(values)
+        scaled = values[order] * (m - np.arange(m))
+        result = np.empty(m)
+        result[order] = np.maximum.accumulate(scaled)
+    elif method == 'fdr_bh':
+        order = np.argsort(values)[::-1]
+        scaled = values[order] * m / (m - np.arange(m))
+        result = np.empty(m)
+        result[order] = np.minimum.accumulate(scaled)
+    else:
+        raise ValueError(f"unknown correction {method!r}, expected one of {CORRECTIONS}")
+    adjusted[tested] = np.minimum(result, 1.0)
+    return adjusted
+
+
+def _cell_samples(df, stats):
+    # (baseline samples, variant samples) for every non-baseline row of stats
+    values = df['Value'].to_numpy()
+    per_site = df.groupby(['Website', 'Metric', 'Variant'], observed=True).indices
+    overall = df.groupby(['Metric', 'Variant'], observed=True).indices
+    empty = np.empty(0, dtype=np.int64)
+
+    def samples(website, metric, variant):
+        if website == OVERALL:
+            positions = overall.get((metric, variant), empty)
+        else:
+            positions = per_site.get((website, metric, variant), empty)
+        cell = values[positions]
+        return cell[~np.isnan(cell)]
+
+    baseline_samples = [samples(row.Website, row.Metric, row.baseline) for row in stats.itertuples(index=False)]
+    variant_samples = [samples(row.Website, row.Metric, row.Variant) for row in stats.itertuples(index=False)]
+    return baseline_samples, variant_samples
+
+
+def _paired_differences(df, cells):
+    # variant - baseline for every page load (Website, Run, Iteration)
+    # measured by both, for every row of cells
+    keys = ['Website', 'Metric', 'Run', 'Iteration']
+    values = df.loc[df['Value'].notna(), keys + ['Variant', 'Value']]
+    values = values.astype({'Website': str, 'Metric': str, 'Variant': str})
+    cells = cells[['Website', 'Metric', 'Variant', 'baseline']].astype(str).reset_index(drop=True)
+    cells['cell'] = np.arange(len(cells))
+    is_overall = cells['Website'] == OVERALL
+    pairs = pd.concat([cells[~is_overall].merge(values, on=['Website', 'Metric', 'Variant']),
+                       cells[is_overall].drop(columns='Website').merge(values, on=['Metric', 'Variant'])])
+    baseline_values = values.rename(columns={'Variant': 'baseline', 'Value': 'baseline_value'})
+    pairs = pairs.merge(baseline_values, on=keys + ['baseline'])
+    differences = (pairs['Value'] - pairs['baseline_value']).to_numpy()
+    positions = pairs.groupby('cell').indices
+    empty = np.empty(0, dtype=np.int64)
+    return [differences[positions.get(c, empty)] for c in range(len(cells))]
+
+
+def _baseline_medians(stats, cells):
+    medians = stats.astype({'Website': str, 'Metric': str, 'Variant': str}).set_index(['Website', 'Metric', 'Variant'])['median']
+    index = pd.MultiIndex.from_arrays([cells['Website'].astype(str), cells['Metric'].astype(str), cells['baseline'].astype(str)])
+    return medians.reindex(index).to_numpy(dtype=np.float64)
+
+
+def _chunks(widths, num_resamples):
+    # Splits cells into chunks of similar sample counts, which keeps the padded
+    # arrays tight; yields (cell indices, padded width).
+    order = np.argsort(widths, kind='stable')
+    widths = np.maximum(widths, 1)[order]
+    start = 0
+    while start < len(order):
+        end = start + 1
+        while end < len(order) and (end - start + 1) * (widths[end] + num_resamples) * 4 <= _MAX_CHUNK_ELEMENTS:
+            end += 1
+        yield order[start:end], int(widths[end - 1])
+        start = end
+
+
+def add_significance(df, stats, num_resamples=2000, confidence=0.95, correction='none', seed=0, paired=False):
+    stats = stats.copy()
+    compared = (stats['Variant'].astype(str) != stats['baseline'].astype(str)) & stats['baseline'].notna()
+    cells = stats[compared]
+
+    p_values = np.full(len(cells), np.nan)
+    ci_low = np.full(len(cells), np.nan)
+    ci_high = np.full(len(cells), np.nan)
+    rng = np.random.default_rng(seed)
+    extra_columns = ()
+
+    if paired:
+        differences = _paired_differences(df, cells)
+        counts = np.array([len(d) for d in differences], dtype=np.int64)
+        baseline_medians = _baseline_medians(stats, cells)
+        for chunk, width in _chunks(counts, num_resamples):
+            d = _padded([differences[c] for c in chunk], width)
+            p_values[chunk] = wilcoxon_signed_rank(d, counts[chunk])
+            if num_resamples > 0:
+                low, high = bootstrap_paired_delta_ci(rng, d, counts[chunk], baseline_medians[chunk], num_resamples, confidence)
+                ci_low[chunk] = low
+                ci_high[chunk] = high
+        median_deltas = np.array([np.median(d) if len(d) else np.nan for d in differences])
+        extra_columns = (('pairs', counts), ('paired_median_delta', median_deltas))
+    else:
+        baseline_samples, variant_samples = _cell_samples(df, cells)
+        x_counts = np.array([len(s) for s in baseline_samples], dtype=np.int64)
+        y_counts = np.array([len(s) for s in variant_samples], dtype=np.int64)
+        for chunk, width in _chunks(np.maximum(x_counts, y_counts), num_resamples):
+            x = _padded([baseline_samples[c] for c in chunk], width)
+            y = _padded([variant_samples[c] for c in chunk], width)
+            p_values[chunk] = mann_whitney_u(x, x_counts[chunk], y, y_counts[chunk])
+            if num_resamples > 0:
+                low, high = bootstrap_median_delta_ci(rng, x, x_counts[chunk], y, y_counts[chunk], num_resamples, confidence)
+                ci_low[chunk] = low
+                ci_high[chunk] = high
+
+    # the per-site cells and the overall rollup are corrected as separate families
+    is_overall = (cells['Website'] == OVERALL).to_numpy()
+    p_adjusted = np.full(len(cells), np.nan)
+    p_adjusted[~is_overall] = adjust_p_values(p_values[~is_overall], correction)
+    p_adjusted[is_overall] = adjust_p_values(p_values[is_overall], correction)
+
+    for column, cell_values in extra_columns + (('p_value', p_values), ('p_adjusted', p_adjusted),
+                                                ('median_delta_ci_low', ci_low), ('median_delta_ci_high', ci_high)):
+        stats[column] = np.nan
+        stats.loc[compared, column] = cell_values
+    return stats
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+
+# Aggregation stage.
+# aggregate() computes every summary statistic in one groupby over the
+# categorical (Website, Metric, Variant) keys plus one (Metric, Variant)
+# rollup for the overall summary, and returns a tidy table with one row per
+# cell. The overall rows have Website == OVERALL. Deltas are relative to the
+# baseline variant of the same website and metric: the first variant in sort
+# order, or the one named by aggregate(df, baseline=...).
+
+OVERALL = 'Overall'
+STATISTICS = ['mean', 'median', 'min', 'max', 'std', 'count']
+
+
+def _add_deltas(table, keys, baseline=None):
+    # keys: the columns that identify one comparison, e.g. ['Website', 'Metric']
+    if baseline is None:
+        is_baseline = table.groupby(keys, observed=True, sort=False).cumcount() == 0
+    else:
+        is_baseline = table['Variant'].astype(str) == baseline
+    baseline_rows = table.loc[is_baseline, keys + ['Variant', 'mean', 'median']].rename(
+        columns={'Variant': 'baseline', 'mean': 'baseline_mean', 'median': 'baseline_median'})
+    table = table.merge(baseline_rows, on=keys, how='left')
+    table['baseline'] = table['baseline'].astype(object)
+    for statistic in ('mean', 'median'):
+        base = table[f'baseline_{statistic}'].replace(0, np.nan)
+        table[f'{statistic}_delta_pct'] = (table[statistic] - base) / base * 100
+    return table.drop(columns=['baseline_mean', 'baseline_median'])
+
+
+def aggregate(df, baseline=None):
+    # baseline: variant name to compare against; defaults to the first variant
+    # checked against the categories, so a subset of the table (e.g. one
+    # phase) that lacks the baseline still aggregates, with NaN deltas
+    if baseline is not None and baseline not in set(df['Variant'].astype('category').cat.categories.astype(str)):
+        raise ValueError(f"baseline variant {baseline!r} not found")
+    per_site = df.groupby(['Website', 'Metric', 'Variant'], observed=True)['Value'].agg(STATISTICS).reset_index()
+    per_site['Website'] = per_site['Website'].astype(str)
+    per_site = _add_deltas(per_site, ['Website', 'Metric'], baseline)
+
+    overall = df.groupby(['Metric', 'Variant'], observed=True)['Value'].agg(STATISTICS).reset_index()
+    overall.insert(0, 'Website', OVERALL)
+    overall = _add_deltas(overall, ['Website', 'Metric'], baseline)
+
+    stats = pd.concat([per_site, overall], ignore_index=True)
+    stats['count'] = stats['count'].astype(np.int64)
+    return stats
+
+
+def site_stats(stats, website):
+    return stats[stats['Website'] == website]
+
+
+def site_stats_groups(stats):
+    # ((website, metric), rows) for every website except the overall rollup
+    return stats[stats['Website'] != OVERALL].groupby(['Website', 'Metric'], observed=True, sort=False)
+
+
+def _print_significance(row):
+    if not hasattr(row, 'p_value') or np.isnan(row.p_value):
+        return
+    if hasattr(row, 'pairs'):
+        line = f"  Paired iterations: {row.pairs:.0f}, Paired Median Delta: {row.paired_median_delta}, Wilcoxon p-value: {row.p_value:.4f}"
+    else:
+        line = f"  p-value: {row.p_value:.4f}"
+    if row.p_adjusted != row.p_value:
+        line += f" (adjusted: {row.p_adjusted:.4f})"
+    if not np.isnan(row.median_delta_ci_low):
+        line += f", Median Delta CI: [{row.median_delta_ci_low:.2f}%, {row.median_delta_ci_high:.2f}%]"
+    print(line)
+
+
+def print_stats(stats, baseline=None):
+    if 'Phase' in stats.columns:
+        for phase in stats['Phase'].unique():
+            print(f"\n=== {phase.capitalize()} iterations ===")
+            print_stats(stats[stats['Phase'] == phase].drop(columns='Phase'), baseline)
+        return
+    reference = "First Variant" if baseline is None else "Baseline"
+    for (website, metric), cells in site_stats_groups(stats):
+        print(f"Statistics for {metric} - {website}:")
+        for row in cells.itertuples(index=False):
+            print(f"  Variant: {row.Variant}, Mean: {row.mean}, Median: {row.median}, Count: {row.count}, Min: {row.min}, Max: {row.max}, Std: {row.std}")
+            print(f"  Mean Delta from {reference}: {row.mean_delta_pct:.2f}%, Median Delta from {reference}: {row.median_delta_pct:.2f}%")
+            _print_significance(row)
+
+    print("\nOverall Summary:")
+    overall = site_stats(stats, OVERALL).sort_values(['Variant', 'Metric'], kind='stable')
+    for row in overall.itertuples(index=False):
+        print(f"  Variant: {row.Variant}, Metric: {row.Metric}, Mean: {row.mean}, Median: {row.median}, Count: {row.count}")
+        print(f"  Mean Delta from {reference}: {row.mean_delta_pct:.2f}%, Median Delta from {reference}: {row.median_delta_pct:.2f}%")
+        _print_significance(row)
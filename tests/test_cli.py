@@ -0,0 +1,11 @@
+import logging
+
+from perfstats.cli import main
+
+
+def test_missing_directory_is_an_error(tmp_path, caplog):
+    missing = tmp_path / 'missing'
+    with caplog.at_level(logging.ERROR, logger='perfstats'):
+        assert main(['stats', str(missing), '--no-progress']) == 1
+    assert f"{missing} is not a directory" in caplog.text
+    assert not missing.exists()
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from perfstats.filtering import COLD_SIGNAL, drop_warmup, parse_condition, tag_phases, trim_outliers
+from perfstats.ingest import LongFrameBuilder
+
+
+def _frame(rows):
+    # rows: (website, variant, metric, value, run, iteration, source)
+    builder = LongFrameBuilder()
+    for website, variant, metric, value, run, iteration, source in rows:
+        builder.append(website, variant, metric, value, iteration=iteration, run=run, source=source)
+    return builder.build()
+
+
+def test_drop_warmup_per_file():
+    # two files in one run directory continue the iteration count
+    rows = [('site', 'base', 'load', float(i), 1, i, 'a.json') for i in range(3)]
+    rows += [('site', 'base', 'load', float(i), 1, i, 'b.json') for i in range(3, 5)]
+    rows += [('site', 'base', 'load', float(i), 2, i, 'c.json') for i in range(2)]
+    kept = drop_warmup(_frame(rows), 1)
+    assert sorted(zip(kept['Source'], kept['Iteration'])) == [('a.json', 1), ('a.json', 2), ('b.json', 4), ('c.json', 1)]
+    assert len(drop_warmup(_frame(rows), 0)) == len(rows)
+
+
+def test_parse_condition():
+    assert parse_condition("geckoPerfStats.DNSLookupNetworkFirst >= 1e-3") == ('geckoPerfStats.DNSLookupNetworkFirst', '>=', 0.001)
+    with pytest.raises(ValueError):
+        parse_condition("DNSLookupNetworkFirst")
+
+
+def test_tag_phases():
+    rows = []
+    # iteration 0: cold, 1: warm (signal 0), 2: no signal value, 3: no signal row
+    for iteration, signal in enumerate([2.0, 0.0, np.nan]):
+        rows.append(('site', 'base', COLD_SIGNAL, signal, 1, iteration, 'a.json'))
+    for iteration in range(4):
+        rows.append(('site', 'base', 'load', 10.0 + iteration, 1, iteration, 'a.json'))
+    # the same iteration index in another run is a different page load
+    rows.append(('site', 'base', 'load', 20.0, 2, 0, 'b.json'))
+    tagged = tag_phases(_frame(rows), "signal > 0")
+    assert list(tagged['Metric'].cat.categories) == ['load']
+    phases = dict(zip(zip(tagged['Run'], tagged['Iteration']), tagged['Phase'].astype(str)))
+    assert phases == {(1, 0): 'cold', (1, 1): 'warm', (1, 2): 'warm', (1, 3): 'warm', (2, 0): 'warm'}
+    assert list(tagged['Phase'].cat.categories) == ['cold', 'warm']
+
+
+def _cell(values, metric='load'):
+    return [('site', 'base', metric, value, 1, i, 'a.json') for i, value in enumerate(values)]
+
+
+def test_trim_outliers_iqr():
+    # quartiles 3 and 7: bounds [-3, 13] with k = 1.5, [1, 9] with k = 0.5
+    df = _frame(_cell([1.0, 2, 3, 4, 5, 6, 7, 8, 30, np.nan]) + _cell([1.0, 2, 3, 1000], metric='other'))
+    kept = trim_outliers(df, 'iqr')
+    load = kept[kept['Metric'] == 'load']['Value']
+    assert sorted(load.dropna()) == [1, 2, 3, 4, 5, 6, 7, 8]
+    # missing values are kept
+    assert load.isna().sum() == 1
+    # bounds are per metric
+    assert sorted(kept[kept['Metric'] == 'other']['Value']) == [1, 2, 3]
+    assert sorted(trim_outliers(df, 'iqr', k=0.5).query("Metric == 'load'")['Value'].dropna()) == [1, 2, 3, 4, 5, 6, 7, 8]
+    assert sorted(trim_outliers(df, 'iqr', k=0.25).query("Metric == 'load'")['Value'].dropna()) == [2, 3, 4, 5, 6, 7, 8]
+
+
+def test_trim_outliers_mad():
+    # median 12.5, MAD 1.5, scaled MAD 2.2239: bounds 12.5 +- 7.78 with k = 3.5
+    df = _frame(_cell([10.0, 11, 12, 13, 14, 50]))
+    assert sorted(trim_outliers(df, 'mad')['Value']) == [10, 11, 12, 13, 14]
+    # with k = 1: 12.5 +- 2.22 drops the low value too
+    assert sorted(trim_outliers(df, 'mad', k=1)['Value']) == [11, 12, 13, 14]
+
+
+def test_trim_outliers_unknown_method():
+    with pytest.raises(ValueError):
+        trim_outliers(_frame(_cell([1.0])), 'zscore')
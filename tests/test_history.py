@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from perfstats.history import HistoryStore, change_point
+
+
+def test_change_point_finds_the_shift():
+    rng = np.random.default_rng(0)
+    values = np.concatenate([rng.normal(100, 1, 12), rng.normal(110, 1, 8)])
+    split, t = change_point(values)
+    assert split == 12
+    assert t > 10
+
+
+@pytest.mark.parametrize('values', [[27.61] * 10, [0.0] * 6, [1.0, 2.0, 3.0]])
+def test_change_point_without_a_change(values):
+    assert change_point(values) == (None, 0.0)
+
+
+def test_change_point_noiseless_step():
+    assert change_point([1.0, 1.0, 1.0, 2.0, 2.0, 2.0]) == (3, np.inf)
+
+
+def _stats(median):
+    return pd.DataFrame({'Website': ['site'], 'Metric': ['load'], 'Variant': ['baseline'],
+                         'median': [median], 'mean': [median], 'count': [10]})
+
+
+def test_dates_are_stored_in_utc(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history.sqlite'))
+    store.record(_stats(1.0), 'naive', date='2024-05-01T03:00:00')
+    store.record(_stats(2.0), 'east', date='2024-05-01T04:00:00+02:00')
+    store.record(_stats(3.0), 'west', date='2024-04-30T22:00:00-07:00')
+    runs = store.runs()
+    assert list(runs['label']) == ['east', 'naive', 'west']
+    assert list(runs['date']) == ['2024-05-01T02:00:00+00:00', '2024-05-01T03:00:00+00:00', '2024-05-01T05:00:00+00:00']
+    trend = store.trend('site', 'load', since='2024-05-01T04:30:00+02:00', until='2024-05-01T03:00:00')
+    assert list(trend['label']) == ['naive']
+    store.close()
+
@@ -0,0 +1,115 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from perfstats.cache import ExtractionCache
+from perfstats.ingest import extract_entries, extract_file, load_json, load_results
+from perfstats.metrics import compile_metrics
+from perfstats.presets import PRESETS
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'data', 'browsertime.json')
+
+# Odd leaves in the fixture: a dict, a list, a null and a numeric string,
+# a zero divisor and a missing navigationTiming key.
+METRICS = PRESETS['asyncopen']['metrics'] + PRESETS['trr']['metrics'] + [
+    ["first_paint", "browserScripts.timings['first-paint']"],
+    ["mean_first_sent", "geckoPerfStats.TRRFirstSentToLastReceived / geckoPerfStats.TRRRequestCount"],
+    ["scaled", "-geckoPerfStats.AsyncOpenToFirstSent * 2 + 1"],
+]
+
+
+@pytest.mark.parametrize('iterate_over', ['geckoPerfStats', 'browserScripts'])
+def test_stream_parse_matches_full_parse(iterate_over):
+    pytest.importorskip('ijson')
+    full, size, _ = extract_file(FIXTURE, METRICS, iterate_over)
+    streamed, streamed_size, _ = extract_file(FIXTURE, METRICS, iterate_over, stream=True)
+    assert full.shape == (5, len(METRICS))
+    assert size == streamed_size == os.path.getsize(FIXTURE)
+    np.testing.assert_array_equal(full, streamed)
+
+
+def test_stream_parse_of_truncated_file_names_it(tmp_path):
+    pytest.importorskip('ijson')
+    file_path = tmp_path / 'browsertime.json'
+    with open(FIXTURE, 'rb') as fixture:
+        file_path.write_bytes(fixture.read()[:200])
+    with pytest.raises(ValueError, match=str(file_path)):
+        extract_file(str(file_path), METRICS, 'geckoPerfStats', stream=True)
+
+
+@pytest.mark.parametrize('stream', [False, True])
+@pytest.mark.parametrize('content, message', [
+    (b'[{"geckoPerfStats": [{"AsyncOpenToConnectEnd": 1}', None),
+    (b'{"geckoPerfStats": []}', 'expected a list of browsertime results, got a JSON object'),
+    (b'[[]]', 'expected browsertime results to be objects, got a JSON array'),
+    (b'[{"geckoPerfStats": 5}]', 'expected geckoPerfStats to be a list, got a JSON number'),
+])
+def test_malformed_file_errors_name_it(tmp_path, stream, content, message):
+    if stream:
+        pytest.importorskip('ijson')
+    file_path = tmp_path / 'browsertime.json'
+    file_path.write_bytes(content)
+    with pytest.raises(ValueError) as error:
+        extract_file(str(file_path), METRICS, 'geckoPerfStats', stream=stream)
+    assert str(error.value).startswith(f"{file_path}: ")
+    if message:
+        assert str(error.value) == f"{file_path}: {message}"
+
+
+def test_extract_entries_values():
+    names = [name for name, _ in METRICS]
+    values = extract_entries(load_json(FIXTURE), compile_metrics(METRICS), 'geckoPerfStats')
+    column = dict(zip(names, values.T))
+    # dict and null leaves are missing, numbers are kept
+    np.testing.assert_array_equal(column['AsyncOpenToConnectEnd'], [10.5, 11.5, np.nan, 13.5, np.nan])
+    # a numeric string is not a number
+    np.testing.assert_array_equal(column['AsyncOpenToFirstSent'], [20, 21, 22, np.nan, 24])
+    # division by zero, and a list leaf
+    np.testing.assert_array_equal(column['trr_dns_start'], [2, np.nan, 6, 8, np.nan])
+    np.testing.assert_array_equal(column['mean_first_sent'], [15, np.nan, 15, 15, 15])
+    np.testing.assert_array_equal(column['connectStart'], [100, 101, 102, np.nan, 104])
+    np.testing.assert_array_equal(column['first_paint'], [250.5, 251.5, 252.5, np.nan, 254.5])
+    np.testing.assert_array_equal(column['scaled'], [-39, -41, -43, np.nan, -47])
+
+
+def _tree(root):
+    for website, variant in (('site_a', 'baseline'), ('site_a', 'baseline_run2'), ('site_b', 'dns_prefetch')):
+        os.makedirs(os.path.join(root, website, variant))
+        shutil.copy(FIXTURE, os.path.join(root, website, variant, 'browsertime.json'))
+    return str(root)
+
+
+def test_cache_round_trip_and_invalidation(tmp_path):
+    root = _tree(tmp_path)
+    file_path = os.path.join(root, 'site_a', 'baseline', 'browsertime.json')
+    values, _, _ = extract_file(file_path, METRICS, 'geckoPerfStats')
+
+    cache = ExtractionCache(root, METRICS, 'geckoPerfStats')
+    cache.put(file_path, os.stat(file_path), values)
+    cache.close()
+
+    cache = ExtractionCache(root, METRICS, 'geckoPerfStats')
+    np.testing.assert_array_equal(cache.get(file_path, os.stat(file_path)), values)
+    stat = os.stat(file_path)
+    os.utime(file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert cache.get(file_path, os.stat(file_path)) is None
+    cache.close()
+
+    # another metric set does not see the cached block
+    other = ExtractionCache(root, METRICS[:1], 'geckoPerfStats')
+    assert other.get(file_path, stat) is None
+    other.close()
+
+
+def test_cached_load_matches_parsed_load(tmp_path):
+    root = _tree(tmp_path)
+    parsed = load_results(root, METRICS, 'geckoPerfStats', use_cache=False)
+    first = load_results(root, METRICS, 'geckoPerfStats')
+    cached = load_results(root, METRICS, 'geckoPerfStats')
+    assert len(parsed) == 3 * 5 * len(METRICS)
+    pd.testing.assert_frame_equal(parsed, first)
+    pd.testing.assert_frame_equal(parsed, cached)
+    assert sorted(parsed['Run'].unique()) == [1, 2]
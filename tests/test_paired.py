@@ -0,0 +1,65 @@
+import json
+import os
+
+import numpy as np
+
+from perfstats.pipeline import extract, summarize
+from perfstats.significance import _paired_differences
+from perfstats.stats import OVERALL
+
+METRIC_SET = {'iterate_over': 'geckoPerfStats', 'metrics': [['load', 'geckoPerfStats.load']]}
+
+# {(website, variant directory, file name): [entry, ...]}, each entry a list of
+# per-iteration load times (None: the perfstat is missing)
+TREE = {
+    # two files in one run directory: iterations 0-1 and 2
+    ('site_a', 'base', 'a.json'): [[10, 11]],
+    ('site_a', 'base', 'b.json'): [[12]],
+    # two entries in one file: iterations 0 and 1 of run 2
+    ('site_a', 'base_run2', 'browsertime.json'): [[20], [21]],
+    ('site_a', 'exp', 'browsertime.json'): [[13, 15, 14]],
+    # one iteration, so iteration 1 of the baseline's run 2 is unpaired
+    ('site_a', 'exp_run2', 'browsertime.json'): [[25]],
+    ('site_b', 'base', 'browsertime.json'): [[100, 100]],
+    ('site_b', 'exp', 'browsertime.json'): [[90, None]],
+}
+
+
+def _tree(root):
+    for (website, variant, filename), entries in TREE.items():
+        os.makedirs(os.path.join(root, website, variant), exist_ok=True)
+        data = [{'geckoPerfStats': [{} if load is None else {'load': load} for load in loads]} for loads in entries]
+        with open(os.path.join(root, website, variant, filename), 'w') as file:
+            json.dump(data, file)
+    return str(root)
+
+
+def test_run_and_iteration_numbering(tmp_path):
+    df = extract(_tree(tmp_path), METRIC_SET, use_cache=False)
+    base = df[(df['Website'] == 'site_a') & (df['Variant'] == 'base')]
+    rows = sorted(zip(base['Run'], base['Iteration'], base['Value'], base['Source']))
+    assert rows == [
+        (1, 0, 10.0, os.path.join('site_a', 'base', 'a.json')),
+        (1, 1, 11.0, os.path.join('site_a', 'base', 'a.json')),
+        (1, 2, 12.0, os.path.join('site_a', 'base', 'b.json')),
+        (2, 0, 20.0, os.path.join('site_a', 'base_run2', 'browsertime.json')),
+        (2, 1, 21.0, os.path.join('site_a', 'base_run2', 'browsertime.json')),
+    ]
+    assert set(df['Variant'].cat.categories) == {'base', 'exp'}
+
+
+def test_paired_differences(tmp_path):
+    df = extract(_tree(tmp_path), METRIC_SET, use_cache=False)
+    stats = summarize(df, bootstrap_samples=0, paired=True)
+    compared = stats[stats['Variant'] == 'exp'].set_index('Website')
+    differences = _paired_differences(df, compared.reset_index())
+    # site_a: run 1 pairs iterations 0-2, run 2 only iteration 0
+    np.testing.assert_array_equal(np.sort(differences[0]), [2, 3, 4, 5])
+    # site_b: the missing value has no pair
+    np.testing.assert_array_equal(differences[1], [-10])
+    # the overall rollup pairs within each website, never across them
+    np.testing.assert_array_equal(np.sort(differences[2]), [-10, 2, 3, 4, 5])
+    assert list(compared.index) == ['site_a', 'site_b', OVERALL]
+    assert list(compared['pairs']) == [4, 1, 5]
+    np.testing.assert_array_equal(compared['paired_median_delta'], [3.5, -10, 3])
+    assert np.isnan(stats.loc[stats['Variant'] == 'base', 'pairs']).all()
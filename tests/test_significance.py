@@ -0,0 +1,70 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from perfstats.significance import (_average_ranks, _bootstrap_medians, _padded, adjust_p_values,
+                                    mann_whitney_u, wilcoxon_signed_rank)
+
+# Reference p-values were computed with scipy 1.17:
+#   scipy.stats.mannwhitneyu(x, y, method='asymptotic')          (continuity and tie correction)
+#   scipy.stats.wilcoxon(d, method='approx', correction=False)   (zero differences dropped)
+
+X = [12.1, 14.3, 11.8, 15.0, 13.2, 14.3, 12.9, 16.4, 13.2, 12.0]
+Y = [14.8, 16.1, 15.2, 13.9, 17.3, 16.1, 15.5, 14.3, 18.0, 15.9, 16.6, 14.3]
+D = [1.5, -0.5, 2.0, 0.0, 3.1, 1.5, -1.0, 2.2, 0.8, 1.5, -0.3, 2.7]
+P = [0.01, 0.04, 0.03, 0.20, np.nan, 0.005]
+
+
+def test_average_ranks_ties_and_padding():
+    ranks, ties = _average_ranks(_padded([[3.0, 1.0, 3.0, 2.0, 3.0], [5.0, 5.0]], 5))
+    np.testing.assert_array_equal(ranks[0], [4.0, 1.0, 4.0, 2.0, 4.0])
+    np.testing.assert_array_equal(ranks[1, :2], [1.5, 1.5])
+    # sum(t^3 - t) over tied groups
+    np.testing.assert_array_equal(ties, [24.0, 6.0])
+
+
+def test_mann_whitney_u_matches_scipy():
+    x = _padded([X, [1.0, 2.0, 3.0], []], 12)
+    y = _padded([Y, [1.0, 2.0, 3.0, 4.0], [1.0]], 12)
+    p = mann_whitney_u(x, np.array([10, 3, 0]), y, np.array([12, 4, 1]))
+    np.testing.assert_allclose(p[:2], [0.004924832405877196, 0.7162897505408428], rtol=1e-12)
+    # a cell without values has no p-value
+    assert np.isnan(p[2])
+
+
+def test_wilcoxon_signed_rank_matches_scipy():
+    p = wilcoxon_signed_rank(_padded([D, [0.0, 0.0]], 12), np.array([12, 2]))
+    np.testing.assert_allclose(p[0], 0.0205438533979482, rtol=1e-12)
+    # only zero differences: no test
+    assert np.isnan(p[1])
+
+
+@pytest.mark.parametrize('method, expected', [
+    ('none', P),
+    ('bonferroni', [0.05, 0.2, 0.15, 1.0, np.nan, 0.025]),
+    ('holm', [0.04, 0.09, 0.09, 0.2, np.nan, 0.025]),
+    ('fdr_bh', [0.025, 0.05, 0.05, 0.2, np.nan, 0.025]),
+])
+def test_adjust_p_values(method, expected):
+    np.testing.assert_allclose(adjust_p_values(P, method), expected, rtol=1e-12)
+
+
+def test_adjust_p_values_unknown_method():
+    with pytest.raises(ValueError):
+        adjust_p_values(P, 'sidak')
+
+
+@pytest.mark.parametrize('sample', [[1.0, 2.0, 7.0], [4.0, 1.0, 9.0, 2.0]])
+def test_bootstrap_medians_match_exact_resampling(sample):
+    # The order-statistic sampler must reproduce the distribution of the
+    # median over all len(sample) ** n equally likely resamples.
+    exact = {}
+    resamples = list(itertools.product(sample, repeat=len(sample)))
+    for resample in resamples:
+        median = float(np.median(resample))
+        exact[median] = exact.get(median, 0) + 1 / len(resamples)
+    medians = _bootstrap_medians(np.random.default_rng(0), np.array([sample]), np.array([len(sample)]), 200_000)[0]
+    assert set(np.unique(medians)) <= set(exact)
+    for median, probability in exact.items():
+        assert np.mean(medians == median) == pytest.approx(probability, abs=0.005)
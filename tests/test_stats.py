@@ -0,0 +1,64 @@
+import pytest
+
+from perfstats.ingest import LongFrameBuilder
+from perfstats.stats import OVERALL, aggregate
+
+# The metrics have very different scales, so an overall delta that mixed
+# metrics would not match the per-metric expectations below.
+VALUES = {
+    ('site1', 'm1', 'a'): [10, 20], ('site1', 'm1', 'b'): [15, 25],
+    ('site1', 'm2', 'a'): [100], ('site1', 'm2', 'b'): [300],
+    ('site2', 'm1', 'a'): [30], ('site2', 'm1', 'b'): [30],
+    ('site2', 'm2', 'a'): [200, 400], ('site2', 'm2', 'b'): [100],
+}
+
+
+def _frame():
+    builder = LongFrameBuilder()
+    for (website, metric, variant), values in VALUES.items():
+        for iteration, value in enumerate(values):
+            builder.append(website, variant, metric, float(value), iteration=iteration)
+    return builder.build()
+
+
+def _row(stats, website, metric, variant):
+    rows = stats[(stats['Website'] == website) & (stats['Metric'] == metric) & (stats['Variant'] == variant)]
+    assert len(rows) == 1
+    return rows.iloc[0]
+
+
+def test_overall_deltas_are_per_metric():
+    stats = aggregate(_frame())
+    m1 = _row(stats, OVERALL, 'm1', 'b')
+    assert m1['baseline'] == 'a'
+    assert m1['count'] == 3
+    assert m1['mean_delta_pct'] == pytest.approx((70 / 3 - 20) / 20 * 100)
+    assert m1['median_delta_pct'] == pytest.approx(25.0)
+    m2 = _row(stats, OVERALL, 'm2', 'b')
+    assert m2['mean_delta_pct'] == pytest.approx((200 - 700 / 3) / (700 / 3) * 100)
+    assert m2['median_delta_pct'] == pytest.approx(0.0)
+    baseline = _row(stats, OVERALL, 'm2', 'a')
+    assert baseline['mean_delta_pct'] == 0 and baseline['median_delta_pct'] == 0
+
+
+def test_per_site_deltas():
+    stats = aggregate(_frame())
+    row = _row(stats, 'site1', 'm1', 'b')
+    assert row['mean_delta_pct'] == pytest.approx(100 / 3)
+    assert row['median_delta_pct'] == pytest.approx(100 / 3)
+    assert _row(stats, 'site2', 'm2', 'b')['median_delta_pct'] == pytest.approx(-200 / 3)
+    assert len(stats) == len(VALUES) + 4
+
+
+def test_named_baseline():
+    stats = aggregate(_frame(), baseline='b')
+    assert set(stats['baseline']) == {'b'}
+    row = _row(stats, OVERALL, 'm1', 'a')
+    assert row['mean_delta_pct'] == pytest.approx((20 - 70 / 3) / (70 / 3) * 100)
+    assert row['median_delta_pct'] == pytest.approx(-20.0)
+    assert _row(stats, 'site1', 'm2', 'a')['median_delta_pct'] == pytest.approx(-200 / 3)
+
+
+def test_unknown_baseline():
+    with pytest.raises(ValueError, match='baseline variant'):
+        aggregate(_frame(), baseline='c')